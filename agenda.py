@@ -0,0 +1,153 @@
+'''
+Builds a personal agenda: the sessions of some learning maps and technologies, at some levels,
+without two sessions at the same time, drawn like the learning maps.
+
+The candidate sessions are swept once in order of end time. For each session, the last session ending
+before it starts is found by bisection, and weighted interval scheduling picks the set of sessions
+of highest total weight: the most sessions, or the most minutes of sessions with --weight minutes.
+The whole catalog, 1500+ sessions, is scheduled in a few milliseconds.
+
+Usage:
+    python agenda.py --maps "IPv6" "Automation" --technologies Security --levels Intermediate Advanced
+'''
+
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Callable, Dict, List
+import argparse
+import time
+
+from catalog import Catalog
+from event_profile import DEFAULT_PROFILE, EventProfile
+from learning_maps import make_events, render_calendar, set_style
+import replay
+from session import Level, Session
+import spans
+
+
+AGENDA_FILE = './agenda.png'
+
+WEIGHTS: Dict[str, Callable[[Session], float]] = {
+    'sessions': lambda session: 1,
+    'minutes': lambda session: (session.end - session.start).total_seconds() / 60,
+}
+
+
+def get_learning_map_ids(catalog: Catalog) -> Dict[str, List[str]]:
+    '''
+    Returns the ids of the learning maps of the catalog, by lower case name. Several categories may
+    have a map of the same name, e.g. Full-Stack Observability in Applications and in Cloud.
+    '''
+
+    learning_map_ids = defaultdict(list)
+
+    for value in catalog.get_attribute('learningmap')['values']:
+        for child in value['child']['values']:
+            learning_map_ids[child['name'].lower()].append(child['id'])
+
+    return dict(learning_map_ids)
+
+
+def select_sessions(catalog: Catalog, profile: EventProfile, learning_maps: List[str] = (),
+                    technologies: List[str] = (), levels: List[Level] = ()) -> List[Session]:
+    '''
+    Returns the sessions of the learning maps and of the technologies, once each, at one of `levels`
+    (every level when empty). A name shared by the maps of several categories selects all of them.
+    Incomplete sessions and Walk-in Labs, which have no fixed time, are left out.
+    Raises KeyError for an unknown learning map name.
+    '''
+
+    learning_map_ids = get_learning_map_ids(catalog)
+    items = []
+
+    for name in learning_maps:
+        for learning_map_id in learning_map_ids[name.lower()]:
+            items += catalog.by_learning_map(learning_map_id)
+    for technology in technologies:
+        items += catalog.by_technology(technology)
+
+    sessions = {}
+
+    for item in items:
+        session = catalog.parse(item, profile.timezone)
+        if (not session.incomplete and session.type != 'Walk-in Lab'
+                and (not levels or session.level in levels)):
+            sessions[session.id] = session
+
+    return list(sessions.values())
+
+
+def schedule(sessions: List[Session], weight: Callable[[Session], float] = WEIGHTS['sessions']) -> List[Session]:
+    '''
+    Returns the non-overlapping subset of `sessions` of highest total weight, in order of start time.
+    A session may start at the exact time the previous one ends.
+    '''
+
+    sessions = sorted(sessions, key=lambda session: (session.end, session.start, session.id))
+    ends = [session.end for session in sessions]
+
+    # best[i] is the highest weight of an agenda made of the first i sessions.
+    best = [0] * (len(sessions) + 1)
+    # previous[i] is the number of sessions ending before session i starts.
+    previous = [0] * len(sessions)
+
+    for i, session in enumerate(sessions):
+        previous[i] = bisect_right(ends, session.start, 0, i)
+        best[i + 1] = max(best[i], best[previous[i]] + weight(session))
+
+    agenda = []
+    i = len(sessions)
+
+    while i > 0:
+        if best[i] == best[i - 1]:
+            i -= 1
+        else:
+            agenda.append(sessions[i - 1])
+            i = previous[i - 1]
+
+    return agenda[::-1]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', nargs='?', default=DEFAULT_PROFILE, help='event profile, see the profiles folder')
+    parser.add_argument('--maps', nargs='+', default=[], help='names of the learning maps')
+    parser.add_argument('--technologies', nargs='+', default=[], help='technologies, e.g. Programmability')
+    parser.add_argument('--levels', nargs='+', default=[], choices=[level.value for level in Level],
+                        help='only keep the sessions of these levels')
+    parser.add_argument('--weight', choices=WEIGHTS, default='sessions',
+                        help='maximise the number of sessions, or the minutes spent in sessions')
+    parser.add_argument('--title', default='My agenda', help='title of the agenda')
+    parser.add_argument('--file', default=AGENDA_FILE, help='path of the agenda image')
+    replay.add_arguments(parser)
+    spans.add_arguments(parser)
+    args = parser.parse_args()
+    spans.start(args)
+
+    if not args.maps and not args.technologies:
+        parser.error('give at least one learning map or technology')
+
+    profile = EventProfile.load(args.profile)
+    client = replay.make_client(replay.load_credentials(profile, args), args, profile)
+    catalog = replay.get_catalog(client, profile, args)
+
+    try:
+        candidates = select_sessions(catalog, profile, args.maps, args.technologies, [Level(level) for level in args.levels])
+    except KeyError as error:
+        parser.error(f'unknown learning map {error}')
+
+    start = time.perf_counter()
+    with spans.span('schedule'):
+        agenda = schedule(candidates, WEIGHTS[args.weight])
+    elapsed = time.perf_counter() - start
+
+    for session in agenda:
+        print(f'{session.start:%a %H:%M} - {session.end:%H:%M}  {session.id:12} {session.name}')
+    print(f'{len(agenda)} sessions out of {len(candidates)}, scheduled in {elapsed * 1000:.1f} ms')
+
+    set_style(profile)
+    render_calendar(args.title, make_events(agenda), args.file, profile)
+    print(f'Agenda written to {args.file}')
+
+    spans.finish(args, client.stats)
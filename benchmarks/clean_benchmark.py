@@ -0,0 +1,74 @@
+'''
+Measures the throughput, in MB/s of input text, of the abstract and technology cleaning of
+all_sessions_to_xlxs.py: the former clean_string and the current sanitize.clean_string.
+
+The abstracts are the sample abstract with HTML tags, entities and control characters mixed in.
+
+Usage, from the repository root:
+    python -m benchmarks.clean_benchmark --sessions 20000
+'''
+
+import argparse
+import random
+import re
+import time
+
+from sanitize import clean_string
+from benchmarks.synthetic import make_catalog
+
+
+NOISE = ['<p>', '</p>', '<br/>', '<a href="https://www.ciscolive.com">', '</a>', '&amp;', '&quot;', '&#39;',
+         '\n', '\x0b', '\x1f']
+
+
+def legacy_clean_string(input_string: str) -> str:
+    '''
+    Former all_sessions_to_xlxs.clean_string.
+    '''
+
+    illegal_chars = [chr(i) for i in range(0,32) if i not in (9,10,13)]
+    cleaned_string = ''.join(char for char in input_string if char not in illegal_chars)
+    cleaned_string = re.sub('<.*?>|\n', '', cleaned_string)
+
+    return cleaned_string
+
+
+def make_abstracts(size: int, seed: int = 0):
+    rand = random.Random(seed)
+    abstracts = []
+
+    for session in make_catalog(size, seed):
+        words = session['abstract'].split(' ')
+        for _ in range(10):
+            words.insert(rand.randrange(len(words)), rand.choice(NOISE))
+        abstracts.append(' '.join(words))
+
+    return abstracts
+
+
+def measure(function, abstracts) -> float:
+    start = time.perf_counter()
+    function(abstracts)
+
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=20000, help='number of abstracts')
+    args = parser.parse_args()
+
+    abstracts = make_abstracts(args.sessions)
+    megabytes = sum(len(abstract.encode()) for abstract in abstracts) / 1e6
+
+    benchmarks = [
+        ('former clean_string', lambda values: [legacy_clean_string(value) for value in values], abstracts),
+        ('clean_string', lambda values: [clean_string(value) for value in values], abstracts),
+    ]
+
+    print(f'{args.sessions} abstracts, {megabytes:.1f} MB')
+
+    for name, function, values in benchmarks:
+        elapsed = measure(function, values)
+        print(f'{name:20} {elapsed:8.3f}s {megabytes / elapsed:8.1f} MB/s')
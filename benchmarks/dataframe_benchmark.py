@@ -0,0 +1,110 @@
+'''
+Compares the construction of the xlsx DataFrames of all_sessions_to_xlxs.py and open_sessions.py,
+between the former row by row approach and the current one-pass make_sheet and make_dataframe.
+
+The rows are built once as each script builds them, only the DataFrame construction is measured.
+The former all_sessions_to_xlxs path used DataFrame.append (removed in pandas 2), emulated here with
+the equivalent pd.concat of the whole frame and one new row. It is quadratic, so it only runs up to
+--legacy-max sessions.
+
+Usage, from the repository root:
+    python -m benchmarks.dataframe_benchmark --sizes 10000 100000
+'''
+
+import argparse
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+import all_sessions_to_xlxs
+import catalog_store
+import open_sessions
+from session import Session
+from benchmarks.synthetic import make_catalog
+
+
+PARSED = 2000
+
+
+def append_rows(rows, columns) -> pd.DataFrame:
+    '''
+    Former all_sessions_to_xlxs behaviour: the frame is copied for each appended session.
+    '''
+
+    df = pd.DataFrame(columns=columns)
+
+    for row in rows:
+        df = pd.concat([df, pd.DataFrame([dict(zip(columns, row))])], ignore_index=True)
+
+    return df
+
+
+def concat_frames(rows, columns) -> pd.DataFrame:
+    '''
+    Former open_sessions behaviour: one single-row DataFrame per session, concatenated at the end.
+    '''
+
+    return pd.concat([pd.DataFrame(data={key: [value] for key, value in row.items()}) for row in rows])
+
+
+def from_records(rows, columns) -> pd.DataFrame:
+    '''
+    Current make_sheet and make_dataframe behaviour: the DataFrame is built once from all the rows.
+    '''
+
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def make_sessions_rows(sessions):
+    '''
+    Rows of all_sessions_to_xlxs.py, built from the catalog store batch of the sessions like the script does.
+    '''
+
+    return all_sessions_to_xlxs.make_rows(pa.Table.from_batches([catalog_store.make_batch('Benchmark', sessions)]))
+
+
+def make_open_rows(sessions):
+    return [open_sessions.make_row(session) for session in sessions]
+
+
+def make_rows(build_rows, size: int):
+    '''
+    Returns `size` rows. Only PARSED rows are really built and then repeated,
+    parsing is not what this benchmark measures.
+    '''
+
+    rows = build_rows([Session(session) for session in make_catalog(min(size, PARSED))])
+
+    return [rows[index % len(rows)] for index in range(size)]
+
+
+def measure(function, rows, columns) -> float:
+    start = time.perf_counter()
+    function(rows, columns)
+
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='number of sessions')
+    parser.add_argument('--legacy-max', type=int, default=10000, help='largest size measured with the former code')
+    args = parser.parse_args()
+
+    benchmarks = [
+        ('all_sessions_to_xlxs', all_sessions_to_xlxs, make_sessions_rows, append_rows),
+        ('open_sessions', open_sessions, make_open_rows, concat_frames),
+    ]
+
+    for name, module, build_rows, legacy in benchmarks:
+        for size in args.sizes:
+            rows = make_rows(build_rows, size)
+            after = measure(from_records, rows, module.COLUMNS)
+
+            if size <= args.legacy_max:
+                before = measure(legacy, rows, module.COLUMNS)
+                print(f'{name:20} {size:7} sessions  before {before:8.2f}s  after {after:6.3f}s  x{before / after:.0f}')
+            else:
+                print(f'{name:20} {size:7} sessions  before {"skipped":>9}  after {after:6.3f}s')
@@ -0,0 +1,101 @@
+'''
+Measures the decoding of the Rainfocus search responses, on pages scaled up from sample_session_json.json:
+the first page holds the `attributes` facets, every page holds --page-size sessions.
+
+- decode: time to decode every page with the json module and with orjson
+- fetch and parse: time and peak of Python allocations to turn every page into Sessions, through
+  RainfocusClient and a replay adapter, either from the list of get_all_sessions or item by item
+  from iter_sessions, keeping the session json or compacting the Sessions
+
+Usage, from the repository root:
+    python -m benchmarks.json_benchmark --sessions 1500
+'''
+
+from urllib.parse import urlencode
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+
+import orjson
+
+from rainfocus import RainfocusClient
+from replay import FixtureStore, ReplayAdapter, request_key
+from session import Session
+from benchmarks.synthetic import load_sample, make_catalog
+
+
+PAGE_SIZE = 50
+
+
+def make_pages(sessions, page_size: int = PAGE_SIZE) -> dict:
+    '''
+    Returns the body of each search page of `sessions`, by `from` offset.
+    '''
+
+    attributes = load_sample()['attributes']
+    pages = {}
+
+    for start in range(0, len(sessions), page_size):
+        items = sessions[start:start + page_size]
+
+        if start == 0:
+            response = {'sectionList': [{'total': len(sessions), 'size': page_size, 'items': items}],
+                        'attributes': attributes}
+        else:
+            response = {'total': len(sessions), 'size': page_size, 'items': items}
+
+        pages[start] = json.dumps(response).encode()
+
+    return pages
+
+
+def measure(function):
+    '''
+    Returns the wall time of `function`, then its peak of Python allocations in a second call.
+    '''
+
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=1500, help='number of sessions')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='sessions per search page')
+    args = parser.parse_args()
+
+    pages = make_pages(make_catalog(args.sessions), args.page_size)
+    megabytes = sum(len(body) for body in pages.values()) / 1e6
+    print(f'{args.sessions} sessions, {len(pages)} pages, {megabytes:.1f} MB')
+
+    for name, loads in [('json', json.loads), ('orjson', orjson.loads)]:
+        elapsed, peak = measure(lambda: [loads(body) for body in pages.values()])
+        print(f'decode {name:28} {elapsed:8.3f}s {megabytes / elapsed:8.1f} MB/s')
+
+    with tempfile.TemporaryDirectory() as folder:
+        store = FixtureStore(folder)
+        for start, body in pages.items():
+            store.put(request_key('/api/search', urlencode({'type': 'session', 'from': start})), body)
+
+        client = RainfocusClient({'rfapiprofileid': 'benchmark'}, workers=1, rate=None, adapter=ReplayAdapter(store))
+
+        benchmarks = [
+            ('get_all_sessions, then parse', lambda: [Session(item) for item in client.get_all_sessions()[1]]),
+            ('iter_sessions into Session', lambda: [Session(item) for item in client.iter_sessions()]),
+            ('iter_sessions into compact Session', lambda: [Session(item).compact() for item in client.iter_sessions()]),
+        ]
+
+        for name, function in benchmarks:
+            elapsed, peak = measure(function)
+            print(f'{name:35} {elapsed:8.3f}s {peak / 1e6:8.1f} MB peak')
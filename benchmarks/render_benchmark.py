@@ -0,0 +1,98 @@
+'''
+Compares the number of renders and the wall time needed to draw one learning map,
+between the former behaviour (Calendar built and saved once per session) and the
+current make_events / render_calendar pipeline (Calendar built and saved once per map).
+
+Usage, from the repository root:
+    python -m benchmarks.render_benchmark --sessions 10 --maps 2
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+from calendar_view.calendar import Calendar
+from calendar_view.core import data
+from PIL import Image
+
+from event_profile import EventProfile
+from learning_maps import Session, make_events, render_calendar, set_style
+from benchmarks.synthetic import make_catalog
+
+
+class RenderCounter:
+    '''
+    Counts the calendar images encoded while in use.
+    '''
+
+    def __enter__(self):
+        self.count = 0
+        self._save = Image.Image.save
+
+        def save(image, *args, **kwargs):
+            self.count += 1
+            return self._save(image, *args, **kwargs)
+
+        Image.Image.save = save
+        return self
+
+    def __exit__(self, *args):
+        Image.Image.save = self._save
+
+
+def render_per_session(title: str, sessions, file_path: str, profile: EventProfile) -> None:
+    '''
+    Former make_calendar_view behaviour: the calendar is rebuilt and saved after each session.
+    '''
+
+    config = data.CalendarConfig(
+        lang='en',
+        title=title,
+        dates=profile.dates,
+        show_date=True,
+        mode=profile.mode,
+        title_vertical_align='top',
+    )
+
+    events = []
+
+    for session in sessions:
+        events.extend(make_events([session]))
+
+        calendar = Calendar.build(config)
+        calendar.add_events(events)
+        calendar.save(file_path)
+
+
+def render_per_map(title: str, sessions, file_path: str, profile: EventProfile) -> None:
+    render_calendar(title, make_events(sessions), file_path, profile)
+
+
+def run(renderer, maps, folder, profile):
+    with RenderCounter() as counter:
+        start = time.perf_counter()
+        for index, sessions in enumerate(maps):
+            renderer(f'Map {index}', sessions, os.path.join(folder, f'map_{index}.png'), profile)
+        elapsed = time.perf_counter() - start
+
+    return counter.count, elapsed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10, help='sessions per learning map')
+    parser.add_argument('--maps', type=int, default=2, help='number of learning maps')
+    args = parser.parse_args()
+
+    catalog = [Session(session) for session in make_catalog(args.sessions * args.maps)]
+    maps = [catalog[i * args.sessions:(i + 1) * args.sessions] for i in range(args.maps)]
+
+    profile = EventProfile.load()
+    set_style(profile)
+
+    with tempfile.TemporaryDirectory() as folder:
+        for name, renderer in (('per session (before)', render_per_session), ('per map (after)', render_per_map)):
+            renders, elapsed = run(renderer, maps, folder, profile)
+            print(f'{name:22} {renders / args.maps:6.1f} renders/map {elapsed / args.maps:8.2f} s/map')
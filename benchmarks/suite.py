@@ -0,0 +1,234 @@
+'''
+Runs one benchmark per stage of the generators, on synthetic catalogs, and saves the results as JSON:
+
+- fetch: RainfocusClient.get_all_sessions against a local fixture_server.py serving synthetic pages
+- parse: Session.__init__ on every session of the catalog
+- render: make_calendar_view of learning maps
+- xlsx: make_sheet and to_excel of all_sessions_to_xlxs.py, make_dataframe and to_excel of open_sessions.py
+- pdf: make_pdf of pdf_generator.py on the rendered learning maps
+
+Each benchmark keeps the best of --repeat runs. With --compare, the ratio to a previous
+results file is printed, so regressions show up between runs.
+
+Usage, from the repository root:
+    python -m benchmarks.suite --sessions 2000 --output results.json
+    python -m benchmarks.suite --sessions 2000 --compare results.json
+'''
+
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlencode
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+import all_sessions_to_xlxs
+import catalog_store
+import open_sessions
+import pdf_generator
+import rainfocus
+from catalog import Catalog
+from event_profile import EventProfile
+from fixture_server import FixtureHandler
+from learning_maps import Learning_Map, make_calendar_view, make_folder, set_style
+from replay import FixtureStore, request_key
+from session import Session
+from benchmarks.synthetic import make_catalog
+
+
+PAGE_SIZE = 50
+LEARNING_MAP_ID = 'benchmark'
+CATEGORY = 'Benchmark'
+EVENT = 'Benchmark'
+
+
+def best_of(function, repeat: int) -> float:
+    '''
+    Returns the shortest wall time of `repeat` calls to `function`, in seconds.
+    '''
+
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def make_store(sessions, folder: str) -> FixtureStore:
+    '''
+    Returns a fixture store holding the search pages of `sessions`, as Rainfocus returns them.
+    '''
+
+    store = FixtureStore(folder)
+
+    for start in range(0, len(sessions), PAGE_SIZE):
+        items = sessions[start:start + PAGE_SIZE]
+
+        if start == 0:
+            response = {'sectionList': [{'total': len(sessions), 'size': PAGE_SIZE, 'items': items}], 'attributes': []}
+        else:
+            response = {'total': len(sessions), 'size': PAGE_SIZE, 'items': items}
+
+        body = urlencode({'type': 'session', 'from': start})
+        store.put(request_key('/api/search', body), json.dumps(response).encode())
+
+    return store
+
+
+def bench_fetch(sessions, folder: str, args) -> dict:
+    FixtureHandler.store = make_store(sessions, os.path.join(folder, 'fixtures'))
+    FixtureHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    search_url = rainfocus.SEARCH_URL
+    rainfocus.SEARCH_URL = f'http://127.0.0.1:{server.server_port}/api/search'
+
+    try:
+        with rainfocus.RainfocusClient({'rfapiprofileid': 'benchmark'}, rate=None) as client:
+            seconds = best_of(client.get_all_sessions, args.repeat)
+    finally:
+        rainfocus.SEARCH_URL = search_url
+        server.shutdown()
+        server.server_close()
+
+    return {'size': len(sessions), 'seconds': seconds, 'per_second': len(sessions) / seconds}
+
+
+def bench_parse(sessions, profile: EventProfile, args) -> dict:
+    seconds = best_of(lambda: [Session(session, profile.timezone) for session in sessions], args.repeat)
+
+    return {'size': len(sessions), 'seconds': seconds, 'per_second': len(sessions) / seconds}
+
+
+def bench_render(sessions, profile: EventProfile, args) -> dict:
+    '''
+    Renders --maps learning maps of --map-sessions sessions each, in the current process.
+    '''
+
+    for index in range(args.maps):
+        for session in sessions[index * args.map_sessions:(index + 1) * args.map_sessions]:
+            session['attributevalues'] = session['attributevalues'] + [{'attribute_id': 'learningmap',
+                                                                         'attributevalue_id': f'{LEARNING_MAP_ID}-{index}'}]
+
+    catalog = Catalog([], sessions, time.time())
+    learning_maps = [Learning_Map(CATEGORY, f'Map {index}', f'{LEARNING_MAP_ID}-{index}', catalog, profile)
+                     for index in range(args.maps)]
+
+    make_folder(profile.output + CATEGORY)
+    set_style(profile)
+    seconds = best_of(lambda: [make_calendar_view(learning_map) for learning_map in learning_maps], args.repeat)
+
+    return {'size': args.maps, 'seconds': seconds, 'per_second': args.maps / seconds}
+
+
+def make_sessions_sheet(sessions) -> pd.DataFrame:
+    '''
+    Sheet of all_sessions_to_xlxs.py, built from the catalog store batch of the sessions like the script does.
+    '''
+
+    return all_sessions_to_xlxs.make_sheet(pa.Table.from_batches([catalog_store.make_batch(EVENT, sessions)]))
+
+
+def bench_xlsx(name: str, make_dataframe, sessions, folder: str, args) -> dict:
+    path = os.path.join(folder, name + '.xlsx')
+    seconds = best_of(lambda: make_dataframe(sessions).to_excel(path, index=False), args.repeat)
+
+    return {'size': len(sessions), 'seconds': seconds, 'per_second': len(sessions) / seconds}
+
+
+def bench_pdf(profile: EventProfile, args) -> dict:
+    make_folder(os.path.join(profile.output, pdf_generator.PDF_FOLDER))
+    seconds = best_of(lambda: pdf_generator.make_pdf(CATEGORY, profile.output), args.repeat)
+
+    return {'size': args.maps, 'seconds': seconds, 'per_second': args.maps / seconds}
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def run(args) -> dict:
+    raw_sessions = make_catalog(args.sessions)
+    profile = copy.copy(EventProfile.load())
+    results = {}
+
+    with tempfile.TemporaryDirectory() as folder:
+        profile.output = folder + '/'
+        sessions = [Session(session, profile.timezone) for session in raw_sessions]
+
+        benchmarks = {
+            'fetch': lambda: bench_fetch(raw_sessions, folder, args),
+            'parse': lambda: bench_parse(raw_sessions, profile, args),
+            'render': lambda: bench_render(raw_sessions, profile, args),
+            'xlsx_all_sessions': lambda: bench_xlsx('all_sessions_to_xlxs', make_sessions_sheet, sessions, folder, args),
+            'xlsx_open_sessions': lambda: bench_xlsx('open_sessions', open_sessions.make_dataframe, sessions, folder, args),
+            'pdf': lambda: bench_pdf(profile, args),
+        }
+
+        for name, benchmark in benchmarks.items():
+            # The pdf benchmark assembles the maps drawn by the render benchmark.
+            if name in args.skip or (name == 'pdf' and 'render' in args.skip):
+                continue
+            results[name] = benchmark()
+            print(f'{name:20} {results[name]["size"]:7} items {results[name]["seconds"]:8.3f}s '
+                  f'{results[name]["per_second"]:10.1f}/s')
+
+    return {
+        'timestamp': time.time(),
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'arguments': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+
+
+def compare(report: dict, path: str) -> None:
+    with open(path) as file:
+        previous = json.load(file)
+
+    print(f'Compared to {path} ({previous["commit"]}):')
+
+    for name, result in report['results'].items():
+        if name in previous['results']:
+            ratio = result['seconds'] / previous['results'][name]['seconds']
+            print(f'{name:20} x{ratio:5.2f} {"slower" if ratio > 1 else "faster"}')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=2000, help='sessions in the synthetic catalog')
+    parser.add_argument('--maps', type=int, default=4, help='learning maps rendered')
+    parser.add_argument('--map-sessions', type=int, default=15, help='sessions per learning map')
+    parser.add_argument('--latency', type=float, default=0.05, help='latency of the local Rainfocus stand-in, in seconds')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the best one is kept')
+    parser.add_argument('--skip', nargs='*', default=[], help='benchmarks to skip, e.g. render pdf')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='previous JSON results to compare with')
+    args = parser.parse_args()
+
+    report = run(args)
+
+    if args.compare:
+        compare(report, args.compare)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,55 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+
+SAMPLE_SESSION_JSON = os.path.join(os.path.dirname(__file__), '..', 'sample_session_json.json')
+
+PREFIXES = ['BRKENS', 'BRKSEC', 'BRKDCN', 'BRKCOL', 'TECSPG', 'LTRSP', 'DEVNET', 'PSOSEC']
+TYPES = ['Breakout', 'Technical Seminar', 'Instructor Led Lab', 'Walk-in Lab', 'DevNet']
+DAYS = ['2024-02-05', '2024-02-06', '2024-02-07', '2024-02-08', '2024-02-09']
+LENGTHS = [45, 60, 90, 120, 240]
+
+
+def load_sample() -> dict:
+    '''
+    Returns the full Rainfocus search response stored in sample_session_json.json.
+    '''
+
+    with open(SAMPLE_SESSION_JSON) as file:
+        return json.load(file)
+
+
+def make_catalog(size: int, seed: int = 0) -> List[dict]:
+    '''
+    Returns `size` session items in the Rainfocus format, cloned from sample_session_json.json.
+    Code, title, type and times are randomised with `seed` so runs are repeatable.
+    '''
+
+    rand = random.Random(seed)
+    template = load_sample()['sectionList'][0]['items'][0]
+    sessions = []
+
+    for index in range(size):
+        # Only the fields changed below are copied, the large nested ones are shared with the template.
+        session = dict(template)
+        session['times'] = [dict(template['times'][0])]
+        session['attributevalues'] = list(template['attributevalues'])
+        level = rand.randint(1, 4)
+        code = f'{rand.choice(PREFIXES)}-{level}{index:04d}'
+        start = datetime.strptime(rand.choice(DAYS), '%Y-%m-%d') + timedelta(hours=rand.randint(7, 16),
+                                                                              minutes=rand.choice([0, 15, 30, 45]))
+        end = start + timedelta(minutes=rand.choice(LENGTHS))
+
+        session['code'] = code
+        session['abbreviation'] = code
+        session['title'] = f'{template["title"]} #{index}'
+        session['type'] = rand.choice(TYPES)
+        session['times'][0]['utcStartTime'] = start.strftime('%Y/%m/%d %H:%M:%S')
+        session['times'][0]['utcEndTime'] = end.strftime('%Y/%m/%d %H:%M:%S')
+        session['times'][0]['seatsRemaining'] = rand.randint(0, int(session['times'][0]['capacity']))
+        sessions.append(session)
+
+    return sessions
@@ -0,0 +1,58 @@
+'''
+Micro-benchmark of the session time parsing: the former strptime + fixed offset path
+against session.parse_time, without cache, with a cold and with a warm cache.
+
+Usage, from the repository root:
+    python -m benchmarks.time_parsing_benchmark --sessions 100000
+'''
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from session import parse_time
+from benchmarks.synthetic import make_catalog
+
+
+def strptime(values):
+    return [datetime.strptime(value, '%Y/%m/%d %H:%M:%S') + timedelta(hours=1) for value in values]
+
+
+def parse(values, event_timezone):
+    return [parse_time(value, event_timezone) for value in values]
+
+
+def parse_uncached(values, event_timezone):
+    return [parse_time.__wrapped__(value, event_timezone) for value in values]
+
+
+def measure(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=100000, help='number of sessions')
+    parser.add_argument('--timezone', default='Europe/Amsterdam', help='timezone of the event')
+    args = parser.parse_args()
+
+    event_timezone = ZoneInfo(args.timezone)
+    values = [session['times'][0][key] for session in make_catalog(args.sessions)
+              for key in ('utcStartTime', 'utcEndTime')]
+
+    before = measure(strptime, values)
+    uncached = measure(parse_uncached, values, event_timezone)
+    parse_time.cache_clear()
+    cold = measure(parse, values, event_timezone)
+    warm = measure(parse, values, event_timezone)
+
+    print(f'{len(values)} times')
+    print(f'strptime + timedelta   {before:6.3f}s')
+    print(f'parse_time, no cache   {uncached:6.3f}s  x{before / uncached:.1f}')
+    print(f'parse_time, cold cache {cold:6.3f}s  x{before / cold:.1f}')
+    print(f'parse_time, warm cache {warm:6.3f}s  x{before / warm:.1f}')
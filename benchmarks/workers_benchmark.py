@@ -0,0 +1,52 @@
+'''
+Records the learning maps rendered per second by the process pool of learning_maps.py,
+for each number of rendering workers.
+
+Usage, from the repository root:
+    python -m benchmarks.workers_benchmark --maps 8 --sessions 15 --workers 1 2 4 8
+'''
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from event_profile import EventProfile
+from learning_maps import Session, render_learning_map
+from benchmarks.synthetic import make_catalog
+
+
+def run(workers: int, maps, folder: str, profile: EventProfile) -> float:
+    '''
+    Renders every map with `workers` processes and returns the maps rendered per second.
+    The pool start-up, including the style set up in each worker, is part of the measure.
+    '''
+
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(render_learning_map, f'Map {index}', sessions, os.path.join(folder, f'map_{index}.png'), profile)
+                   for index, sessions in enumerate(maps)]
+        for future in futures:
+            future.result()
+
+    return len(maps) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--maps', type=int, default=8, help='number of learning maps')
+    parser.add_argument('--sessions', type=int, default=15, help='sessions per learning map')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()], help='worker counts to measure')
+    args = parser.parse_args()
+
+    catalog = [Session(session) for session in make_catalog(args.sessions * args.maps)]
+    maps = [catalog[i * args.sessions:(i + 1) * args.sessions] for i in range(args.maps)]
+
+    profile = EventProfile.load()
+
+    with tempfile.TemporaryDirectory() as folder:
+        for workers in sorted(set(args.workers)):
+            print(f'{workers:3} workers {run(workers, maps, folder, profile):6.2f} maps/s')
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from datetime import tzinfo
+from typing import List, Optional
+import os
+import time
+
+import orjson
+
+from rainfocus import RainfocusClient
+from session import Session
+import spans
+
+
+SNAPSHOT_PATH = './catalog_snapshot.json'
+SNAPSHOT_MAX_AGE = 15 * 60
+
+
+class Catalog:
+    '''
+    Snapshot of the whole Rainfocus session catalog, fetched once and indexed locally.
+
+    Sessions are indexed by:
+    - attribute value id, which is what `search.learningmap` and `search.sessiontype` filter on
+    - session type name, e.g. 'Breakout'
+    - technology name, e.g. 'Programmability'
+
+    It is also the registry of the parsed sessions: `parse` builds the Session of a code once,
+    and every learning map holding that session shares it.
+    '''
+
+    def __init__(self, attributes: List[dict], sessions: List[dict], timestamp: float):
+        self.attributes = attributes
+        self.sessions = sessions
+        self.timestamp = timestamp
+
+        self._by_attribute = defaultdict(list)
+        self._by_type = defaultdict(list)
+        self._by_technology = defaultdict(list)
+        self._parsed = {}
+
+        for session in sessions:
+            self._by_type[session['type']].append(session)
+
+            for attribute in session.get('attributevalues', []):
+                self._by_attribute[attribute['attributevalue_id']].append(session)
+                if attribute['attribute_id'] == 'Technology':
+                    self._by_technology[attribute['value']].append(session)
+
+    @staticmethod
+    def fetch(client: RainfocusClient) -> 'Catalog':
+        '''
+        Downloads every session from the Rainfocus API.
+        '''
+
+        with spans.span('fetch'):
+            initial_response, sessions = client.get_all_sessions()
+
+        return Catalog(initial_response['attributes'], sessions, time.time())
+
+    @staticmethod
+    def load(path: str = SNAPSHOT_PATH) -> 'Catalog':
+        with spans.span('load_snapshot'), open(path, 'rb') as file:
+            snapshot = orjson.loads(file.read())
+
+        return Catalog(snapshot['attributes'], snapshot['sessions'], snapshot['timestamp'])
+
+    def save(self, path: str = SNAPSHOT_PATH) -> None:
+        with open(path, 'wb') as file:
+            file.write(orjson.dumps({'timestamp': self.timestamp, 'attributes': self.attributes, 'sessions': self.sessions}))
+
+    @staticmethod
+    def load_fresh(path: str = SNAPSHOT_PATH, max_age: float = SNAPSHOT_MAX_AGE) -> Optional['Catalog']:
+        '''
+        Returns the snapshot stored in `path` if it is younger than `max_age` seconds, None otherwise.
+        '''
+
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age:
+            return Catalog.load(path)
+
+        return None
+
+    @staticmethod
+    def get(client: RainfocusClient, path: str = SNAPSHOT_PATH, max_age: float = SNAPSHOT_MAX_AGE) -> 'Catalog':
+        '''
+        Returns the snapshot stored in `path` if it is younger than `max_age` seconds.
+        Otherwise fetches a new one and stores it in `path`, so the next scripts of the run can reuse it.
+        '''
+
+        catalog = Catalog.load_fresh(path, max_age)
+        if catalog is not None:
+            return catalog
+
+        catalog = Catalog.fetch(client)
+        catalog.save(path)
+
+        return catalog
+
+    def parse(self, session: dict, event_timezone: Optional[tzinfo] = None) -> Session:
+        '''
+        Returns the Session of a session item, parsed the first time its code is asked for.
+        '''
+
+        key = (session['code'], event_timezone)
+        parsed = self._parsed.get(key)
+
+        if parsed is None:
+            parsed = self._parsed[key] = Session(session, event_timezone)
+
+        return parsed
+
+    def get_attribute(self, attribute_id: str) -> dict:
+        '''
+        Returns the facet `attribute_id` of the search response, e.g. 'learningmap'.
+        '''
+
+        return list(filter(lambda d: d.get('id') == attribute_id, self.attributes))[0]
+
+    def by_attribute(self, attributevalue_id: str) -> List[dict]:
+        return self._by_attribute.get(attributevalue_id, [])
+
+    def by_learning_map(self, learning_map_id: str) -> List[dict]:
+        return self.by_attribute(learning_map_id)
+
+    def by_session_type(self, session_type: str) -> List[dict]:
+        '''
+        Accepts either the session type id used by `search.sessiontype` (e.g. 'BRK'),
+        or the type name found in each session (e.g. 'Breakout').
+        '''
+
+        return self._by_attribute.get(session_type) or self._by_type.get(session_type, [])
+
+    def by_technology(self, technology: str) -> List[dict]:
+        return self._by_technology.get(technology, [])
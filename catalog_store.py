@@ -0,0 +1,112 @@
+'''
+Typed, columnar store of the session catalogs, written by all_sessions_to_xlxs.py.
+
+One Arrow IPC file holds several events: one record batch per event, the `events` key of the schema
+metadata gives the batch of each event. Loading memory-maps the file, so only the pages of the columns
+actually read are loaded, and reading one event does not touch the batches of the others.
+
+For analysis:
+    table = catalog_store.load(event='Cisco Live Amsterdam 2024')
+    df = table.to_pandas()
+'''
+
+from typing import List, Optional
+import json
+import os
+
+import pyarrow as pa
+
+from session import Session
+
+
+CATALOG_STORE = './sessions.arrow'
+
+# start and end are in the local time of the event.
+SCHEMA = pa.schema([
+    ('event', pa.string()),
+    ('id', pa.string()),
+    ('name', pa.string()),
+    ('type', pa.string()),
+    ('level', pa.string()),
+    ('speakers', pa.list_(pa.string())),
+    ('distinguished_speaker', pa.bool_()),
+    ('technologies', pa.list_(pa.string())),
+    ('abstract', pa.string()),
+    ('start', pa.timestamp('s')),
+    ('end', pa.timestamp('s')),
+    ('day_name', pa.string()),
+    ('capacity', pa.int32()),
+    ('seats_remaining', pa.int32()),
+    ('waitlist_remaining', pa.int32()),
+    ('room', pa.string()),
+])
+
+
+def make_batch(event: str, sessions: List[Session]) -> pa.RecordBatch:
+    '''
+    Returns the sessions of an event as one record batch of SCHEMA.
+    '''
+
+    return pa.RecordBatch.from_pydict({
+        'event': [event] * len(sessions),
+        'id': [session.id for session in sessions],
+        'name': [session.name for session in sessions],
+        'type': [session.type for session in sessions],
+        'level': [session.level.value if session.level else None for session in sessions],
+        'speakers': [session.participants for session in sessions],
+        'distinguished_speaker': [session.distinguished_speaker for session in sessions],
+        'technologies': [session.technologies for session in sessions],
+        'abstract': [session.abstract for session in sessions],
+        'start': [session.start for session in sessions],
+        'end': [session.end for session in sessions],
+        'day_name': [session.day_name for session in sessions],
+        'capacity': [session.capacity for session in sessions],
+        'seats_remaining': [session.seats_remaining for session in sessions],
+        'waitlist_remaining': [session.waitlist_remaining for session in sessions],
+        'room': [session.room for session in sessions],
+    }, schema=SCHEMA)
+
+
+def read_batches(path: str = CATALOG_STORE) -> dict:
+    '''
+    Returns the memory-mapped record batch of each event stored in `path`.
+    '''
+
+    if not os.path.exists(path):
+        return {}
+
+    reader = pa.ipc.open_file(pa.memory_map(path))
+    events = json.loads(reader.schema.metadata[b'events'])
+
+    return {event: reader.get_batch(index) for index, event in enumerate(events)}
+
+
+def load(path: str = CATALOG_STORE, event: Optional[str] = None) -> pa.Table:
+    '''
+    Returns the sessions of `event`, or of every event, memory-mapped from `path`.
+    Raises KeyError if the event is not stored.
+    '''
+
+    batches = read_batches(path)
+
+    if event is not None:
+        batches = {event: batches[event]}
+
+    return pa.Table.from_batches(list(batches.values()), schema=SCHEMA)
+
+
+def save(batch: pa.RecordBatch, event: str, path: str = CATALOG_STORE) -> None:
+    '''
+    Stores the batch of an event in `path`, replacing its previous batch and keeping the other events.
+    The file is written next to `path` first, so readers never see a partial file.
+    '''
+
+    batches = read_batches(path)
+    batches[event] = batch
+    schema = SCHEMA.with_metadata({'events': json.dumps(list(batches))})
+
+    with pa.OSFile(path + '.tmp', 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for event_batch in batches.values():
+            writer.write_batch(event_batch)
+
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,44 @@
+from zoneinfo import ZoneInfo
+import json
+
+
+DEFAULT_PROFILE = 'profiles/amsterdam_2024.json'
+
+
+class EventProfile:
+    '''
+    Everything that differs from one Cisco Live event to another, loaded from a json file in `profiles`:
+
+    - name: name of the event, e.g. 'Cisco Live Amsterdam 2024'
+    - credentials: path of the credentials.json holding the Rainfocus profile id of the event
+    - snapshot: path of the catalog snapshot of the event
+    - output: folder of the learning maps, one sub-folder per category
+    - sessions_xlsx: path of the sheet written by all_sessions_to_xlxs.py
+    - dates: days shown in the learning maps, e.g. '2024-02-05 - 2024-02-09'
+    - timezone: timezone of the event, e.g. 'Europe/Amsterdam'
+    - mode: calendar_view mode, 'day_hours' or 'working_hours'
+    - style: calendar_view style values. Values of the keys ending with `_font` are font sizes.
+    '''
+
+    def __init__(self, name, credentials, snapshot, output, sessions_xlsx, dates, timezone, mode, style):
+        self.name = name
+        self.credentials = credentials
+        self.snapshot = snapshot
+        self.output = output
+        self.sessions_xlsx = sessions_xlsx
+        self.dates = dates
+        self.timezone = ZoneInfo(timezone)
+        self.mode = mode
+        self.style = style
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def load(path: str = DEFAULT_PROFILE) -> 'EventProfile':
+        with open(path) as file:
+            return EventProfile(**json.load(file))
+
+    def load_credentials(self) -> dict:
+        with open(self.credentials) as file:
+            return json.load(file)
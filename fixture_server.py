@@ -0,0 +1,65 @@
+'''
+Local stand-in for the Rainfocus API, answering from the responses recorded with --record.
+
+It serves the responses of one event, the default profile unless another one is given.
+Point the scripts at it with the RAINFOCUS_URL environment variable, e.g.:
+    python fixture_server.py --latency 0.3 &
+    RAINFOCUS_URL=http://127.0.0.1:8000/api/search python learning_maps.py
+
+Each response is delayed by --latency seconds (plus up to --jitter seconds), which makes
+the concurrency of the fetch measurable without hitting Rainfocus.
+'''
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import argparse
+import random
+import time
+
+from event_profile import DEFAULT_PROFILE, EventProfile
+from replay import FIXTURES_FOLDER, FixtureStore, get_fixtures_folder, request_key
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    store = None
+    latency = 0.0
+    jitter = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        try:
+            content = self.store.get(request_key(urlsplit(self.path).path, body))
+        except KeyError:
+            self.send_error(404, 'Not recorded')
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', nargs='?', default=DEFAULT_PROFILE, help='event profile, see the profiles folder')
+    parser.add_argument('--fixtures', default=FIXTURES_FOLDER, help='folder of the recorded Rainfocus responses')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to each response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra seconds added to each response')
+    args = parser.parse_args()
+
+    FixtureHandler.store = FixtureStore(get_fixtures_folder(EventProfile.load(args.profile), args))
+    FixtureHandler.latency = args.latency
+    FixtureHandler.jitter = args.jitter
+
+    server = ThreadingHTTPServer((args.host, args.port), FixtureHandler)
+    print(f'Serving {len(FixtureHandler.store.index)} recorded responses on http://{args.host}:{args.port}/api/search')
+    server.serve_forever()
@@ -0,0 +1,339 @@
+'''
+Local HTTP service generating the learning maps and the sheets of an event on request.
+
+The service keeps warm what every script run pays for again: the imports, the credentials,
+the catalog, the rendering processes with their style, grids and event boxes, and the files
+already generated. The catalog is fetched again in the background every --refresh seconds;
+a learning map is only rendered again once its sessions changed.
+
+    GET /maps                 learning maps of the event, as json: id, name, category and ETag
+    GET /maps/<id>.png        calendar view of a learning map, also .webp, .jpg and .pdf (one page)
+    GET /sessions.xlsx        every session, as written by all_sessions_to_xlxs.py
+    GET /open/<type>.xlsx     seats left in the sessions of a type, as written by open_sessions.py
+    GET /status               catalog age, cached files, renders in progress and Rainfocus stats
+
+Every file has an ETag: the hash of the sessions of a learning map, or the catalog timestamp for the sheets.
+A request whose If-None-Match matches gets a 304, without rendering anything. Requests for a file
+being generated wait for that generation instead of starting another one.
+
+Without network, run it on recorded responses, or against fixture_server.py:
+    python generator_service.py --replay
+    RAINFOCUS_URL=http://127.0.0.1:8000/api/search python generator_service.py
+'''
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple
+from urllib.parse import unquote, urlsplit
+import argparse
+import io
+import multiprocessing
+import os
+import threading
+import time
+
+import orjson
+import pyarrow as pa
+from PIL import Image
+
+from all_sessions_to_xlxs import make_sheet
+import catalog_store
+from catalog import SNAPSHOT_MAX_AGE, Catalog
+from event_profile import DEFAULT_PROFILE, EventProfile
+from image_output import ImageOutput
+from learning_maps import Learning_Map, prepare_learning_map, render_learning_map
+import open_sessions
+from pipeline import JpegPdf
+from rainfocus import RainfocusClient
+import replay
+from session import Session
+import spans
+
+
+PORT = 8080
+
+# Image format of each extension served. A one page PDF is made from the .jpg of the learning map.
+EXTENSIONS = {'png': 'png', 'webp': 'webp', 'jpg': 'jpeg'}
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'jpg': 'image/jpeg',
+    'pdf': 'application/pdf',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'json': 'application/json',
+}
+
+
+class MemoryOutput(ImageOutput):
+    '''
+    Keeps the image encoded in its first format in memory. The service never writes in the output folder
+    of the event, where pdf_generator.py would take its images for the pages of the batch run.
+    '''
+
+    def write(self, image: Image.Image, file_path: str) -> None:
+        content = io.BytesIO()
+        self.save(image, lambda: image.convert('RGB'), self.formats[0], content, self.formats[0])
+        self.content = content.getvalue()
+
+
+def render_map(name: str, sessions, profile: EventProfile, image_format: str) -> bytes:
+    '''
+    Renders a learning map in a rendering process, like make_calendar_view, and returns the image.
+    '''
+
+    output = MemoryOutput([image_format])
+    spans.call_traced(render_learning_map, name, sessions, name, profile, output)
+
+    return output.content
+
+
+def make_pdf_page(get_jpeg: Callable[[], bytes]) -> bytes:
+    '''
+    Returns a one page PDF holding the JPEG of a learning map as is.
+    '''
+
+    content = io.BytesIO()
+    pdf = JpegPdf(content)
+    pdf.add_page(get_jpeg())
+    pdf.close()
+
+    return content.getvalue()
+
+
+def make_xlsx(make_dataframe: Callable, *args) -> bytes:
+    xlsx = io.BytesIO()
+    make_dataframe(*args).to_excel(xlsx, index=False)
+
+    return xlsx.getvalue()
+
+
+class GeneratorService:
+    '''
+    Catalog, learning maps and generated files of an event, shared by the request threads.
+
+    `files` caches the content of each file by key, with the ETag it was generated for.
+    `pending` holds the generations in progress, by key and ETag, so concurrent requests share them.
+    '''
+
+    def __init__(self, profile: EventProfile, client: RainfocusClient, args: argparse.Namespace, workers: int):
+        self.profile = profile
+        self.client = client
+        self.args = args
+        self.lock = threading.RLock()
+        self.files: Dict[tuple, Tuple[str, bytes]] = {}
+        self.pending: Dict[tuple, Future] = {}
+        # The rendering processes are started from a request thread: forkserver starts them from a clean
+        # single-threaded process instead of forking the threads of the server.
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('forkserver'))
+        self.threads = ThreadPoolExecutor(workers)
+
+        self.set_catalog(replay.get_catalog(client, profile, args))
+
+    def set_catalog(self, catalog: Catalog) -> None:
+        '''
+        Parses and hashes the sessions of every learning map of `catalog`, then makes it the current catalog.
+        Files of unchanged learning maps stay cached, as their ETag does not change.
+        '''
+
+        maps = {}
+
+        for learning_map in Learning_Map.get_learning_maps(catalog, self.profile):
+            sessions, sessions_hash = prepare_learning_map(learning_map)
+            maps[learning_map.id] = (learning_map, sessions, sessions_hash)
+
+        with self.lock:
+            self.catalog = catalog
+            self.maps = maps
+
+    def refresh(self) -> None:
+        '''
+        Fetches the catalog again, and stores it as the snapshot of the event for the scripts.
+        '''
+
+        catalog = Catalog.fetch(self.client)
+
+        if not self.args.replay:
+            catalog.save(self.profile.snapshot)
+
+        self.set_catalog(catalog)
+
+    def refresh_every(self, interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            try:
+                self.refresh()
+                print(f'{time.strftime("%H:%M:%S")} catalog refreshed, {self.client.stats}')
+            except Exception as error:
+                print(f'{time.strftime("%H:%M:%S")} catalog refresh failed: {error!r}')
+            finally:
+                # The service has no run report: drop the spans, which would pile up for the whole event.
+                spans.RECORDER.pop()
+
+    def get_file(self, key: tuple, etag: str, generate: Callable[[], Future]) -> bytes:
+        '''
+        Returns the file `key` generated for `etag`: from the cache, from the generation in progress,
+        or from a new generation started with `generate`.
+        '''
+
+        with self.lock:
+            cached = self.files.get(key)
+            if cached is not None and cached[0] == etag:
+                return cached[1]
+
+            future = self.pending.get((key, etag))
+            if future is None:
+                future = self.pending[(key, etag)] = generate()
+                future.add_done_callback(lambda done: self.store(key, etag, done))
+
+        return future.result()
+
+    def store(self, key: tuple, etag: str, future: Future) -> None:
+        with self.lock:
+            del self.pending[(key, etag)]
+            if future.exception() is None:
+                self.files[key] = (etag, future.result())
+
+    def get_map(self, learning_map_id: str, extension: str) -> Tuple[str, Callable[[], bytes]]:
+        '''
+        Returns the ETag of a learning map file, and the function returning its content.
+        Raises KeyError for an unknown learning map or extension.
+        '''
+
+        learning_map, sessions, sessions_hash = self.maps[learning_map_id]
+
+        if extension == 'pdf':
+            jpeg = self.get_map(learning_map_id, 'jpg')[1]
+            return sessions_hash, lambda: self.get_file(('map', learning_map_id, extension), sessions_hash,
+                                                        lambda: self.threads.submit(make_pdf_page, jpeg))
+
+        image_format = EXTENSIONS[extension]
+
+        def content() -> bytes:
+            return self.get_file(('map', learning_map_id, extension), sessions_hash, lambda: self.executor.submit(
+                render_map, learning_map.name, sessions, self.profile, image_format))
+
+        return sessions_hash, content
+
+    def get_sheet(self, name: str) -> Tuple[str, Callable[[], bytes]]:
+        '''
+        Returns the ETag of a sheet, `sessions` or `open/<type>`, and the function returning its content.
+        Raises KeyError for an unknown sheet.
+        '''
+
+        catalog = self.catalog
+        etag = str(catalog.timestamp)
+
+        if name == 'sessions':
+            def make_dataframe():
+                sessions = [catalog.parse(session, self.profile.timezone) for session in catalog.sessions]
+                return make_sheet(pa.Table.from_batches([catalog_store.make_batch(self.profile.name, sessions)]))
+        elif name.startswith('open/') and name[len('open/'):] in open_sessions.SESSION_TYPES:
+            def make_dataframe():
+                sessions = [Session(session, self.profile.timezone)
+                            for session in catalog.by_session_type(name[len('open/'):])]
+                return open_sessions.make_dataframe(sessions)
+        else:
+            raise KeyError(name)
+
+        return etag, lambda: self.get_file(('sheet', name), etag, lambda: self.threads.submit(make_xlsx, make_dataframe))
+
+    def get_index(self) -> bytes:
+        return orjson.dumps([{'id': learning_map.id, 'name': learning_map.name, 'category': learning_map.category,
+                              'etag': sessions_hash}
+                             for learning_map, sessions, sessions_hash in self.maps.values()])
+
+    def get_status(self) -> bytes:
+        with self.lock:
+            return orjson.dumps({
+                'event': self.profile.name,
+                'catalog_age': time.time() - self.catalog.timestamp,
+                'learning_maps': len(self.maps),
+                'cached_files': len(self.files),
+                'cached_bytes': sum(len(content) for etag, content in self.files.values()),
+                'generating': len(self.pending),
+                'rainfocus': str(self.client.stats),
+            })
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.threads.shutdown()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service: GeneratorService = None
+
+    def do_GET(self):
+        path = unquote(urlsplit(self.path).path).strip('/')
+        name, _, extension = path.rpartition('.')
+
+        try:
+            if path == 'maps':
+                self.send_content(self.service.get_index(), 'json')
+            elif path == 'status':
+                self.send_content(self.service.get_status(), 'json')
+            elif name.startswith('maps/'):
+                self.send_file(*self.service.get_map(name[len('maps/'):], extension), extension)
+            elif extension == 'xlsx':
+                self.send_file(*self.service.get_sheet(name), extension)
+            else:
+                self.send_error(404)
+        except KeyError:
+            self.send_error(404)
+        except Exception as error:
+            self.send_error(500, repr(error))
+        finally:
+            spans.RECORDER.pop()
+
+    def send_file(self, etag: str, content: Callable[[], bytes], extension: str) -> None:
+        etag = f'"{etag}"'
+
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_content(content(), extension, etag)
+
+    def send_content(self, content: bytes, extension: str, etag: str = None) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES[extension])
+        self.send_header('Content-Length', str(len(content)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', nargs='?', default=DEFAULT_PROFILE, help='event profile, see the profiles folder')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of rendering processes')
+    parser.add_argument('--refresh', type=float, default=SNAPSHOT_MAX_AGE, help='seconds between two catalog fetches')
+    replay.add_arguments(parser)
+    args = parser.parse_args()
+
+    profile = EventProfile.load(args.profile)
+    client = replay.make_client(replay.load_credentials(profile, args), args, profile)
+    ServiceHandler.service = GeneratorService(profile, client, args, args.workers)
+
+    stop = threading.Event()
+    threading.Thread(target=ServiceHandler.service.refresh_every, args=(args.refresh, stop), daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+    print(f'Serving {len(ServiceHandler.service.maps)} learning maps of {profile} on http://{args.host}:{args.port}/maps')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        ServiceHandler.service.close()
@@ -0,0 +1,142 @@
+'''
+Output stage of the learning maps: writes the calendar image held in memory in one or more formats,
+and a small thumbnail of it, in the same pass.
+
+Formats, with their encode time and size on a 7620 x 7842 learning map:
+    png         lossless PNG, as calendar_view writes it     3.1s  0.85 MB
+    png8        palette-quantised PNG, 256 colours           1.9s  0.36 MB
+    webp        lossless WebP                                1.3s  0.30 MB
+    webp-lossy  lossy WebP, --quality                        5.0s  0.42 MB
+    jpeg        JPEG, --quality                              0.5s  1.88 MB
+
+jpeg is the fastest to write, and the fastest page for pdf_generator.py to read.
+
+With --thumbnail-width, thumbnails are also written in the same formats, under the _Thumbnails folder
+of the event, one sub-folder per category.
+'''
+
+from typing import List, Optional
+import argparse
+import os
+
+from PIL import Image
+
+import spans
+
+
+FORMATS = {
+    'png': '.png',
+    'png8': '.png',
+    'webp': '.webp',
+    'webp-lossy': '.webp',
+    'jpeg': '.jpg',
+}
+DEFAULT_FORMATS = ['png']
+QUALITY = 80
+THUMBNAIL_WIDTH = 800
+THUMBNAILS_FOLDER = '_Thumbnails'
+
+
+class ImageOutput:
+    '''
+    Formats, quality and thumbnail width of the images written for each learning map.
+    Sent to the rendering processes, so it only holds plain values.
+    '''
+
+    def __init__(self, formats: List[str] = DEFAULT_FORMATS, quality: int = QUALITY,
+                 thumbnail_width: Optional[int] = None):
+        extensions = [FORMATS[image_format] for image_format in formats]
+        if len(set(extensions)) != len(extensions):
+            raise ValueError(f'{formats} would write several images with the same extension')
+
+        self.formats = formats
+        self.quality = quality
+        self.thumbnail_width = thumbnail_width
+
+    def image_path(self, file_path: str, image_format: str) -> str:
+        return os.path.splitext(file_path)[0] + FORMATS[image_format]
+
+    def thumbnail_path(self, file_path: str, image_format: str) -> str:
+        '''
+        <event>/<category>/<name>.png has its thumbnail in <event>/_Thumbnails/<category>/<name>.<extension>.
+        '''
+
+        category_folder, file_name = os.path.split(self.image_path(file_path, image_format))
+        event_folder, category = os.path.split(category_folder)
+
+        return os.path.join(event_folder, THUMBNAILS_FOLDER, category, file_name)
+
+    def paths(self, file_path: str) -> List[str]:
+        '''
+        Returns every file written for the image of `file_path`.
+        '''
+
+        paths = [self.image_path(file_path, image_format) for image_format in self.formats]
+        if self.thumbnail_width:
+            paths += [self.thumbnail_path(file_path, image_format) for image_format in self.formats]
+
+        return paths
+
+    def write(self, image: Image.Image, file_path: str) -> None:
+        '''
+        Writes `image` in each format, and its thumbnails. `file_path` gives the folder and the name
+        of the images, its extension is replaced by the one of each format.
+        Each image written is recorded as an 'image' span holding its size in bytes.
+        '''
+
+        # The calendar is opaque: its alpha channel is only dropped for the formats which cannot keep it,
+        # and the RGB copy is shared by them and the thumbnail.
+        rgb = None
+
+        def get_rgb() -> Image.Image:
+            nonlocal rgb
+            if rgb is None:
+                rgb = image.convert('RGB')
+            return rgb
+
+        for image_format in self.formats:
+            self.save(image, get_rgb, image_format, self.image_path(file_path, image_format), image_format)
+
+        if self.thumbnail_width and image.width > self.thumbnail_width:
+            source = get_rgb()
+            size = (self.thumbnail_width, round(source.height * self.thumbnail_width / source.width))
+
+            with spans.span('thumbnail resize', 'image'):
+                thumbnail = source.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+            os.makedirs(os.path.dirname(self.thumbnail_path(file_path, self.formats[0])), exist_ok=True)
+            for image_format in self.formats:
+                self.save(thumbnail, lambda: thumbnail, image_format, self.thumbnail_path(file_path, image_format),
+                          image_format + ' thumbnail')
+
+    def save(self, image: Image.Image, get_rgb, image_format: str, path, name: str) -> None:
+        '''
+        Encodes `image` in `image_format` to `path`, a file path or a binary file object.
+        '''
+
+        with spans.span(name, 'image') as args:
+            if image_format == 'png':
+                image.save(path, 'PNG')
+            elif image_format == 'png8':
+                get_rgb().quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE).save(path, 'PNG')
+            elif image_format == 'webp':
+                # method 2 and quality 0 are the fastest lossless settings which still find the flat areas.
+                image.save(path, 'WEBP', lossless=True, method=2, quality=0)
+            elif image_format == 'webp-lossy':
+                image.save(path, 'WEBP', quality=self.quality)
+            elif image_format == 'jpeg':
+                get_rgb().save(path, 'JPEG', quality=self.quality)
+
+            args['bytes'] = os.path.getsize(path) if isinstance(path, str) else path.tell()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--format', dest='formats', nargs='+', choices=FORMATS, default=DEFAULT_FORMATS,
+                        help='formats of the images written for each learning map')
+    parser.add_argument('--quality', type=int, default=QUALITY, help='quality of the jpeg and webp-lossy images')
+    parser.add_argument('--thumbnail-width', type=int, nargs='?', const=THUMBNAIL_WIDTH,
+                        help=f'also write thumbnails in the {THUMBNAILS_FOLDER} folder, {THUMBNAIL_WIDTH} pixels wide by default')
+
+
+def from_arguments(args: argparse.Namespace) -> ImageOutput:
+    return ImageOutput(args.formats, args.quality, args.thumbnail_width)
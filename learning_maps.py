@@ -1,49 +1,73 @@
-from datetime import datetime, timedelta
 from calendar_view.core import data
 from calendar_view.config import style
 from calendar_view.core.config import CalendarConfig
 from calendar_view.calendar import Calendar
+from calendar_view.core.calendar_events import CalendarEvents, EventDrawHelper
+from calendar_view.core.calendar_grid import CalendarGrid
+from calendar_view.core.round_rectangle import draw_rounded_rectangle
+from calendar_view.core.utils import FontUtils, StringUtils
 from calendar_view.core.event import Event
 from calendar_view.core.event import EventStyles
 from calendar_view.core.event import EventStyle
-import requests
+from PIL import Image, ImageDraw
+import math
+import multiprocessing
 import os
 from multiprocessing.pool import ThreadPool as Pool
 import threading
-from typing import List, Type
+from typing import List, Optional, Tuple, Type
 import json
+import hashlib
+import argparse
+from functools import lru_cache, partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from catalog import Catalog
+from event_profile import DEFAULT_PROFILE, EventProfile
+import image_output
+from image_output import ImageOutput
+import replay
+from session import Level, Session
+import spans
+
+
+MANIFEST_FILE = 'manifest.json'
+# Event boxes are up to a day wide, a few MB each: keep enough for the maps sharing sessions
+# with the previous ones, so the cache of each process stays within a few hundred MB.
+EVENT_BOX_CACHE = 128
+
+# Style of the profile last applied to calendar_view in this process, and its key in the caches.
+_applied_style = None
+_style_key = None
+
+# Empty day / hour grid of each event, and the same grid over the background, drawn once per process.
+_grids = {}
+_templates = {}
 
 
 class Learning_Map:
-    def __init__(self, category, name, id):
+    def __init__(self, category, name, id, catalog, profile):
         self.category = category
         self.name = name.replace('/', '-')
         self.id = id
+        self.catalog = catalog
+        self.profile = profile
 
     def __str__(self):
         return f'{self.category = } -- {self.name = } -- {self.id = }'
 
+    def file_path(self) -> str:
+        return self.profile.output + '/' + self.category + '/' + self.name + ".png"
+
 
     @staticmethod
-    def get_learning_maps() -> List[Type['Learning_Map']]:
+    def get_learning_maps(catalog: Catalog, profile: EventProfile) -> List[Type['Learning_Map']]:
 
         '''
-        Use the Rainfocus API and compute the dictionary of all learning_maps in JSON format.
+        Use the catalog snapshot and compute the dictionary of all learning_maps in JSON format.
         Return a list of instances of Learning_Map.
         '''
 
-        url = "https://events.rainfocus.com/api/search"
-
-        payload = {'type': 'session',
-        'catalogDisplay': 'list'}
-
-        headers = {
-        'rfapiprofileid': credentials['rfapiprofileid'],
-        'referer': 'https://www.ciscolive.com/'
-        }
-
-        response = requests.request("POST", url, headers=headers, data=payload)
-        learning_maps_json = list(filter(lambda d: d.get('id') == 'learningmap', response.json()['attributes']))[0]
+        learning_maps_json = catalog.get_attribute('learningmap')
         
         learning_maps = []
 
@@ -55,7 +79,7 @@ class Learning_Map:
                 id = child['id']
                 name = child['name']
 
-                learning_maps.append(Learning_Map(category, name, id))
+                learning_maps.append(Learning_Map(category, name, id, catalog, profile))
 
         for learning_map in learning_maps:
             print(learning_map)
@@ -76,54 +100,12 @@ class Learning_Map:
         return categories
 
     
-    def get_sessions(self):
+    def get_sessions(self) -> List[dict]:
         '''
-        Take a learning map and returns the associated sessions in a json object.
+        Take a learning map and returns the associated sessions from the catalog snapshot.
         '''
 
-        url = "https://events.rainfocus.com/api/search"
-
-        payload =   {'search.learningmap': self.id,
-                    'type': 'session'}
-
-        headers = {
-        'rfapiprofileid': credentials['rfapiprofileid'],
-        'referer': 'https://www.ciscolive.com/'
-        }
-
-        response = requests.request("POST", url, headers=headers, data=payload)
-
-        return response.json()
-
-
-class Session():
-
-    def __init__(self, session_json):
-        self.type = session_json['type']
-        if 'times' in session_json:
-            start = session_json['times'][0].get('utcStartTime', 'Null')
-            if start != 'Null':
-                self.start = datetime.strptime(start, '%Y/%m/%d %H:%M:%S') + timedelta(hours=2)
-            else:
-                self.start = 'Null'
-            end = session_json['times'][0].get('utcEndTime', 'Null')
-            if end != 'Null':
-                self.end = datetime.strptime(end, '%Y/%m/%d %H:%M:%S') + timedelta(hours=2)
-            else:
-                self.end = 'Null'
-            self.incomplete = False
-        else: 
-            self.incomplete = True
-        self.name = session_json['title']
-        self.id = session_json['code']
-        match int(self.id.split('-')[1][0]):
-            case 1: self.level = 'Introductory'
-            case 2: self.level = 'Intermediate'
-            case 3: self.level = 'Advanced'
-            case 4: self.level = 'General'
-        
-    def __str__(self) -> str:
-        return f"{self.id} - {self.name}"
+        return self.catalog.by_learning_map(self.id)
 
 
 def make_folder(folder_path: str) -> None:
@@ -136,52 +118,28 @@ def make_folder(folder_path: str) -> None:
         os.makedirs(folder_path)
 
 
-def make_calendar_view(learning_map: Learning_Map) -> None:
+def make_events(sessions: List[Session]) -> List[Event]:
     '''
-    For given learning_map;
-    Makes a .png calendar view inside the learning_map.category folder.
+    Takes a list of sessions and returns the associated calendar events.
+    Incomplete sessions and Walk-in Labs are skipped.
     '''
 
-    folder = LEARNING_MAPS_FOLDER + '/' + learning_map.category
-    
-    sessions_json = learning_map.get_sessions()
-    sessions = []
-
-    for session in sessions_json['sectionList'][0]['items']:
-        sessions.append(Session(session))
-
-    style.hour_height = 500
-    style.day_width = 1500
-    style.event_notes_color = '#0D274D'
-    style.title_font = style.image_font(250)
-    style.hour_number_font = style.image_font(50)
-    style.day_of_week_font = style.image_font(150)
-    style.event_title_font = style.image_font(80)
-    style.event_notes_font = style.image_font(60)
-
-    config = data.CalendarConfig(
-        lang='en',
-        title=learning_map.name,
-        dates='2024-02-05 - 2024-02-09',
-        show_date=True,
-        mode='day_hours',
-        title_vertical_align='top',
-    )
-
     events = []
 
     for session in sessions:
         if session.incomplete == False:
             if session.type != 'Walk-in Lab':
                 match session.level:
-                        case 'Introductory': 
+                        case Level.INTRODUCTORY: 
                             color = EventStyle(event_border=(116, 191, 75, 240), event_fill=(116, 191, 75, 180))
-                        case 'Intermediate': 
+                        case Level.INTERMEDIATE: 
                             color = EventStyle(event_border=(251, 171, 44, 240), event_fill=(251, 171, 44, 180))
-                        case 'Advanced': 
+                        case Level.ADVANCED: 
                             color = EventStyle(event_border=(227, 36, 27, 240), event_fill=(227, 36, 27, 180))
-                        case 'General': 
+                        case Level.GENERAL: 
                             color = EventStyle(event_border=(0, 188, 235, 240), event_fill=(0, 188, 235, 180))
+                        case _:
+                            color = None
                         
                 events.append(Event(day=session.start.strftime('%Y-%m-%d'), 
                                     start=session.start.strftime('%H:%M'), 
@@ -190,33 +148,374 @@ def make_calendar_view(learning_map: Learning_Map) -> None:
                                     notes=session.name,
                                     style=color))
 
-        calendar = Calendar.build(config)
+    return events
+
+
+def set_style(profile: EventProfile) -> None:
+    '''
+    Sets the calendar_view style shared by every learning map of the event.
+    Does nothing if this process already uses the style of the profile.
+    '''
+
+    global _applied_style, _style_key
+
+    if _applied_style == profile.style:
+        return
+
+    for key, value in profile.style.items():
+        setattr(style, key, style.image_font(value) if key.endswith('_font') else value)
+
+    _applied_style = profile.style
+    _style_key = json.dumps(profile.style, sort_keys=True)
+
+
+def get_grid(config: CalendarConfig, profile: EventProfile):
+    '''
+    Returns the empty grid image of the event: hour lines, day lines, hour numbers and day titles.
+    It only depends on the dates, mode and style of the profile, so it is drawn once and shared by every map.
+    '''
+
+    key = (profile.dates, profile.mode, _style_key)
+
+    if key not in _grids:
+        grid = CalendarGrid(config)
+        grid.draw_grid()
+        _grids[key] = grid.get_image()
+
+    return _grids[key]
+
+
+def get_template(config: CalendarConfig, profile: EventProfile) -> Image.Image:
+    '''
+    Returns the empty grid of the event composed over the background, which each map copies.
+    '''
+
+    key = (profile.dates, profile.mode, _style_key)
+
+    if key not in _templates:
+        grid = get_grid(config, profile)
+        background = Image.new('RGBA', grid.size, style.image_bg)
+        _templates[key] = Image.alpha_composite(background, grid)
+
+    return _templates[key]
+
+
+@lru_cache(maxsize=EVENT_BOX_CACHE)
+def draw_event_box(title: str, notes: str, border: tuple, fill: tuple, box: Tuple[float, float, float, float],
+                   vertical_align: str, style_key: str) -> Tuple[Image.Image, Tuple[int, int]]:
+    '''
+    Draws one event box, with its wrapped title and notes, on its own transparent image,
+    the same way CalendarEvents._draw_event draws it on the event layer, with the fix of its line 156
+    from the README: the text wraps at the width of the box, which is narrower for overlapping sessions.
+
+    `box` is the position of the box relative to the returned offset, which is negative when
+    the text overflows the box on the left or the top. The same session drawn with the same size
+    in several maps gives the same arguments, so the box is drawn once and pasted in each map.
+    `style_key` only keeps the boxes of different event styles apart in the cache.
+    '''
+
+    x1, y1, x2, y2 = box
+    texts = []
+
+    cell_inner_size = EventDrawHelper.count_cell_inner_size((x1, x2), (y1, y2))
+
+    if cell_inner_size[0] > 0 and cell_inner_size[1] > 0:
+        title_metadata = EventDrawHelper.build_title_metadata(title, cell_inner_size)
+        notes_inner_size = (
+            cell_inner_size[0],
+            cell_inner_size[1] - (title_metadata.size[1] + style.event_title_margin if title_metadata.visible else 0)
+        )
+        notes_metadata = EventDrawHelper.build_notes_metadata(notes, notes_inner_size)
+        total_height = EventDrawHelper.count_final_text_height(title_metadata, notes_metadata)
+        y_top_offset = y1 + style.event_padding
+
+        if title_metadata.visible:
+            y_text_offset = EventDrawHelper.calculate_text_y_position_offset(vertical_align, cell_inner_size[1],
+                                                                             title_metadata.size[1], total_height)
+            title_position = ((x1 + x2) / 2 - title_metadata.size[0] / 2, y_top_offset + y_text_offset)
+            texts.append((title_position, title_metadata.text, 'center', style.event_title_font, style.event_title_color))
+            y_top_offset = title_position[1] + title_metadata.size[1] + style.event_title_margin
+
+        if notes_metadata.visible:
+            y_text_offset = 0
+            if not title_metadata.visible:
+                y_text_offset = EventDrawHelper.calculate_text_y_position_offset(vertical_align, cell_inner_size[1],
+                                                                                 notes_metadata.size[1], total_height)
+            notes_position = (x1 + style.event_padding, y_top_offset + y_text_offset)
+            texts.append((notes_position, notes_metadata.text, 'left', style.event_notes_font, style.event_notes_color))
+
+    # The border and the text may overflow the box, the image holds them. Shifting by whole pixels
+    # keeps the rounding of the drawing the same as on the event layer.
+    measure = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    margin = style.event_border_width
+    left, top, right, bottom = x1 - margin, y1 - margin, x2 + margin, y2 + margin
+    for position, text, align, font, color in texts:
+        bounds = measure.multiline_textbbox(position, text, align=align, font=font)
+        left, top = min(left, bounds[0]), min(top, bounds[1])
+        right, bottom = max(right, bounds[2]), max(bottom, bounds[3])
+
+    dx, dy = math.floor(min(0, left)), math.floor(min(0, top))
+    image = Image.new('RGBA', (math.ceil(right) - dx + 1, math.ceil(bottom) - dy + 1), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw_rounded_rectangle(draw, [(x1 - dx, y1 - dy), (x2 - dx, y2 - dy)], style.event_radius, outline=border, fill=fill,
+                           width=style.event_border_width)
+
+    for (x, y), text, align, font, color in texts:
+        draw.multiline_text((x - dx, y - dy), text, align=align, font=font, fill=color)
+
+    return image, (dx, dy)
+
+
+def place_event_box(calendar_events: CalendarEvents, event: Event) -> Tuple[Image.Image, Tuple[int, int]]:
+    '''
+    Returns the image of an event box and where it goes on the grid, with the cascade of overlapping events.
+    The position helpers are the private ones of calendar_view, so the boxes land exactly where it draws them.
+    '''
+
+    config = calendar_events.config
+    day_number = (event.get_start_date(config) - config.get_date_range()[0]).days
+    x = CalendarEvents._CalendarEvents__get_event_x(day_number)
+    y = calendar_events._CalendarEvents__get_event_y(event.start_time, event.end_time)
+
+    cascade_event_width = (x[1] - x[0] - style.line_day_width) / event.cascade_total
+    x1 = x[0] + style.line_day_width / 2 + (event.cascade_index - 1) * cascade_event_width
+    origin = (int(x1), int(y[0]))
+    box = (x1 - origin[0], y[0] - origin[1], x1 + cascade_event_width - origin[0], y[1] - origin[1])
+
+    image, (dx, dy) = draw_event_box(event.title, event.notes, tuple(event.style.event_border),
+                                     tuple(event.style.event_fill), box, config.title_vertical_align, _style_key)
+
+    return image, (origin[0] + dx, origin[1] + dy)
+
+
+def compose_calendar(calendar: Calendar, profile: EventProfile) -> Image.Image:
+    '''
+    Same image as Calendar._build_image, without its full-size event layer and compositing passes:
+    the grid template is pasted under the title band, and each event box composed over the grid.
+
+    Where boxes of overlapping sessions collide, calendar_view overwrites the first box with the second,
+    while composing shows the first one through the second.
+    '''
+
+    template = get_template(calendar.config, profile)
+    title = calendar.config.title
+
+    title_size = FontUtils.get_multiline_text_size(style.title_font, title)
+    title_width = title_size[0] + style.title_padding_left + style.title_padding_right
+    title_height = title_size[1] + style.title_padding_top + style.title_padding_bottom
+    width = max(template.width, title_width)
+    events_start = (int((width - template.width) / 2), title_height)
+
+    image = Image.new('RGBA', (width, template.height + title_height), style.image_bg)
+    image.paste(template, events_start)
+
+    band = Image.new('RGBA', (width, title_height), (0, 0, 0, 0))
+    ImageDraw.Draw(band).multiline_text((max(style.title_padding_left, (width - title_size[0]) / 2), style.title_padding_top),
+                                        title, align='center', font=style.title_font, fill=style.title_color)
+    image.alpha_composite(band)
+
+    for event in calendar.events.events:
+        box, origin = place_event_box(calendar.events, event)
+        image.alpha_composite(box, (events_start[0] + origin[0], events_start[1] + origin[1]))
+
+    return image
+
+
+def render_calendar(title: str, events: List[Event], file_path: str, profile: EventProfile,
+                    output: ImageOutput = None) -> Image.Image:
+    '''
+    Builds, draws and saves a single calendar holding all the events.
+    Must be called once per learning map, after every event has been collected.
+    The image is written by `output`, a .png at file_path by default, and returned.
+    '''
+
+    config = data.CalendarConfig(
+        lang='en',
+        title=title,
+        dates=profile.dates,
+        show_date=True,
+        mode=profile.mode,
+        title_vertical_align='top',
+    )
+
+    # Same steps as Calendar.build and Calendar.save, split to time the drawing and the image encoding apart.
+    with spans.span('build'):
+        calendar = Calendar(config)
         calendar.add_events(events)
-        calendar.save(folder + '/' + learning_map.name + ".png")
+
+    with spans.span('draw'):
+        calendar.events.group_cascade_events()
+
+        # A title too long for its box moves every title to a legend under the calendar:
+        # calendar_view draws those maps itself, from the cached grid, which it only reads.
+        if config.legend or StringUtils.is_blank(title):
+            calendar.grid._grid_image = get_grid(config, profile)
+            calendar.events.draw_grid(calendar.grid.get_size())
+            calendar._build_image()
+        else:
+            calendar.full_image = compose_calendar(calendar, profile)
+
+    with spans.span('encode'):
+        (output or ImageOutput()).write(calendar.full_image, file_path)
+
+    return calendar.full_image
+
+
+def hash_sessions(sessions: List[Session]) -> str:
+    '''
+    Returns a content hash of the normalised list of sessions drawn in a learning map.
+    Only the fields visible on the calendar are hashed: code, title, start, end, level and type.
+    '''
+
+    normalised = sorted([session.id, session.name, str(session.start), str(session.end), session.level, session.type]
+                        for session in sessions if session.incomplete == False)
+
+    return hashlib.sha256(json.dumps(normalised).encode()).hexdigest()
+
+
+def load_manifest(folder: str) -> dict:
+    '''
+    Returns the manifest mapping each learning map id to the hash of its sessions at the last render.
+    '''
+
+    if not os.path.exists(folder + MANIFEST_FILE):
+        return {}
+
+    with open(folder + MANIFEST_FILE) as file:
+        return json.load(file)
+
+
+def save_manifest(folder: str, manifest: dict) -> None:
+    with open(folder + MANIFEST_FILE, 'w') as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+
+
+def prepare_learning_map(learning_map: Learning_Map, manifest: dict = None,
+                         output: ImageOutput = None) -> Optional[Tuple[List[Session], str]]:
+    '''
+    Fetches and parses the sessions of learning_map, and hashes them.
+    Returns the sessions and their hash, or None if every image of `output` is up to date with the manifest.
+    '''
+
+    sessions = []
+
+    with spans.span('parse', map=learning_map.name):
+        for session in learning_map.get_sessions():
+            sessions.append(learning_map.catalog.parse(session, learning_map.profile.timezone))
+
+        sessions_hash = hash_sessions(sessions)
+
+    paths = (output or ImageOutput()).paths(learning_map.file_path())
+
+    if manifest is not None and manifest.get(learning_map.id) == sessions_hash and all(map(os.path.exists, paths)):
+        print(f'-- UNCHANGED {learning_map.name} --')
+        return None
+
+    return sessions, sessions_hash
+
+
+def render_learning_map(name: str, sessions: List[Session], file_path: str, profile: EventProfile,
+                        output: ImageOutput = None) -> str:
+    '''
+    Draws and saves the calendar of a learning map. Runs in a rendering worker process,
+    which only sets the style again when it switches to another event.
+    '''
+
+    set_style(profile)
+
+    with spans.span(name, 'map'):
+        render_calendar(name, make_events(sessions), file_path, profile, output)
+
+    return name
+
+
+def make_calendar_view(learning_map: Learning_Map, manifest: dict = None, output: ImageOutput = None) -> None:
+    '''
+    For given learning_map;
+    Makes the calendar view images inside the learning_map.category folder, in the current process.
+
+    When a manifest is given, the rendering is skipped if the images exist and the sessions
+    hash the same as in the manifest. The manifest is updated with the new hash otherwise.
+    '''
+
+    prepared = prepare_learning_map(learning_map, manifest, output)
+
+    if prepared is not None:
+        sessions, sessions_hash = prepared
+        render_learning_map(learning_map.name, sessions, learning_map.file_path(), learning_map.profile, output)
+
+        if manifest is not None:
+            manifest[learning_map.id] = sessions_hash
     
     return learning_map.name
 
 
-if __name__ == '__main__':
+def generate(profile: EventProfile, catalog: Catalog, pool: Pool, executor: ProcessPoolExecutor,
+             force: bool = False, output: ImageOutput = None) -> None:
+    '''
+    Generates the learning maps of an event.
+    Sessions are parsed in the threads of `pool`, and rendered in the processes of `executor`.
+    '''
 
-    with open('credentials.json') as file:
-        credentials = json.load(file)
-    
-    LEARNING_MAPS_FOLDER = './learning_maps/'
-    
-    learning_maps = Learning_Map.get_learning_maps()
-    print('Done collecting all learning map sessions. Generating .png for each learning_map')
+    learning_maps = Learning_Map.get_learning_maps(catalog, profile)
+    print(f'Done collecting all {profile} learning map sessions. Generating the images of each learning_map')
 
     folders = Learning_Map.get_categories(learning_maps)
 
     # in case the folders to store learning_maps don't already exist
     for folder in folders:
-        make_folder(LEARNING_MAPS_FOLDER + folder)
-    
+        make_folder(profile.output + folder)
+
+    manifest = {} if force else load_manifest(profile.output)
+    futures = {}
+
+    for learning_map, prepared in zip(learning_maps, pool.imap(partial(prepare_learning_map, manifest=manifest, output=output), learning_maps)):
+        if prepared is not None:
+            sessions, sessions_hash = prepared
+            future = executor.submit(spans.call_traced, render_learning_map,
+                                     learning_map.name, sessions, learning_map.file_path(), profile, output)
+            futures[future] = (learning_map.id, sessions_hash)
+
+    for future in as_completed(futures):
+        done, worker_spans = future.result()
+        spans.RECORDER.merge(worker_spans)
+        learning_map_id, sessions_hash = futures[future]
+        manifest[learning_map_id] = sessions_hash
+        print(f'-- DONE {done} --')
+
+    save_manifest(profile.output, manifest)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Generates a calendar view image for each learning map.')
+    parser.add_argument('profiles', nargs='*', default=[DEFAULT_PROFILE], help='event profiles, see the profiles folder')
+    parser.add_argument('--force', action='store_true', help='render every learning map, even the unchanged ones')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of rendering processes')
+    image_output.add_arguments(parser)
+    replay.add_arguments(parser)
+    spans.add_arguments(parser)
+    args = parser.parse_args()
+    spans.start(args)
+    output = image_output.from_arguments(args)
+
+    profiles = [EventProfile.load(path) for path in args.profiles]
+    client = None
+
+    # Fetching and parsing run in threads, drawing and PNG encoding are CPU-bound and run in processes.
+    # With a ThreadPool doing both, the GIL capped the speedup:
     # 1 thread: 5 minutes and 4 seconds
     # 5 threads: 68 seconds
     # 10 threads: 52 seconds
     # 20 threads: 57 seconds
-    with Pool(10) as pool:
-        for done in pool.imap_unordered(make_calendar_view, learning_maps):
-            print(f'-- DONE {done} --')
\ No newline at end of file
+    # The pools, the HTTP connections and the warm rendering processes are shared by all the events.
+    # The rendering processes are started on the first render, while the fetching threads hold locks:
+    # forkserver starts them from a clean single-threaded process instead of forking those threads.
+    context = multiprocessing.get_context('forkserver')
+    with Pool(10) as pool, ProcessPoolExecutor(args.workers, mp_context=context) as executor:
+        for profile in profiles:
+            credentials = replay.load_credentials(profile, args)
+            client = replay.make_client(credentials, args, profile, client)
+            generate(profile, replay.get_catalog(client, profile, args), pool, executor, args.force, output)
+
+    spans.finish(args, client.stats)
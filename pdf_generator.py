@@ -0,0 +1,116 @@
+from PIL import Image
+from multiprocessing import Pool
+from typing import Iterator, List, Optional, Tuple
+import argparse
+import os
+import resource
+import sys
+
+from image_output import THUMBNAILS_FOLDER
+
+
+LEARNING_MAPS_FOLDER = './learning_maps/'
+PDF_FOLDER = '_PDF'
+EXCLUDED_FOLDERS = (PDF_FOLDER, THUMBNAILS_FOLDER, 'z_History')
+# A learning map written in several formats is read from the first one: JPEG decodes the fastest,
+# and at a reduced scale when the pages are downscaled.
+PAGE_EXTENSIONS = ('.jpg', '.png', '.webp')
+JPEG_QUALITY = 75
+
+
+def get_categories(folder_path: str = LEARNING_MAPS_FOLDER) -> List[str]:
+    '''
+    Returns the name of each category folder holding learning map images.
+    '''
+
+    return sorted(d for d in os.listdir(folder_path)
+                  if os.path.isdir(os.path.join(folder_path, d)) and d not in EXCLUDED_FOLDERS)
+
+
+def get_page_files(category_path: str) -> List[str]:
+    '''
+    Returns the image file of each learning map of a category, sorted by name.
+    '''
+
+    files = os.listdir(category_path)
+    pages = {}
+
+    # The preferred extensions come last, and replace the others.
+    for extension in reversed(PAGE_EXTENSIONS):
+        for image_file in files:
+            name, file_extension = os.path.splitext(image_file)
+            if file_extension == extension:
+                pages[name] = image_file
+
+    return [pages[name] for name in sorted(pages)]
+
+
+def iter_pages(category_path: str, max_width: Optional[int] = None) -> Iterator[Image.Image]:
+    '''
+    Yields the learning maps of a category one at a time, converted to RGB.
+    Pages wider than `max_width` are downscaled, keeping their aspect ratio.
+    '''
+
+    for image_file in get_page_files(category_path):
+        with Image.open(os.path.join(category_path, image_file)) as image:
+            if max_width is not None and image.width > max_width:
+                image.draft('RGB', (max_width, round(image.height * max_width / image.width)))
+            page = image.convert('RGB')
+
+        if max_width is not None and page.width > max_width:
+            page = page.resize((max_width, round(page.height * max_width / page.width)), Image.LANCZOS)
+
+        yield page
+
+
+def peak_rss() -> int:
+    '''
+    Returns the peak resident set size of the current process, in bytes.
+    '''
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def make_pdf(category: str, folder_path: str = LEARNING_MAPS_FOLDER, max_width: Optional[int] = None,
+             quality: int = JPEG_QUALITY) -> Tuple[str, int, int]:
+    '''
+    Writes the PDF of a category, one page at a time, so only one image is held in memory.
+    The first page creates the file, the next ones are appended to it.
+    Pages are JPEG compressed with `quality`.
+
+    Returns the category, the number of pages and the peak RSS of the process.
+    '''
+
+    pdf_path = os.path.join(folder_path, PDF_FOLDER, category + '.pdf')
+    pages = 0
+
+    for page in iter_pages(os.path.join(folder_path, category), max_width):
+        page.save(pdf_path, 'PDF', append=pages > 0, quality=quality)
+        page.close()
+        pages += 1
+
+    return category, pages, peak_rss()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Generates a PDF for each learning map category.')
+    parser.add_argument('--folder', default=LEARNING_MAPS_FOLDER, help='folder holding one sub-folder per category')
+    parser.add_argument('--max-width', type=int, help='downscale the pages wider than this, in pixels')
+    parser.add_argument('--quality', type=int, default=JPEG_QUALITY, help='JPEG quality of the pages')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of categories built in parallel')
+    args = parser.parse_args()
+
+    os.makedirs(os.path.join(args.folder, PDF_FOLDER), exist_ok=True)
+    categories = get_categories(args.folder)
+
+    # A new process per category, so the peak RSS reported is the one of that category only.
+    with Pool(args.workers, maxtasksperchild=1) as pool:
+        results = [pool.apply_async(make_pdf, (category, args.folder, args.max_width, args.quality))
+                   for category in categories]
+
+        for result in results:
+            category, pages, peak = result.get()
+            print(f'-- DONE {category}: {pages} pages, peak RSS {peak / 1e6:.0f} MB --')
@@ -0,0 +1,314 @@
+'''
+Generates the learning maps and the PDF of each category in one pipelined run.
+
+The stages run concurrently on an asyncio event loop, linked by bounded queues:
+
+    fetch   the sessions of each learning map, `search.learningmap` searches in threads
+    parse   the sessions into Session, and their hash for the manifest
+    render  the calendar in the rendering processes: draw, encode the images of --format,
+            and encode the PDF page in memory, as JPEG, or reuse the .jpg of --format jpeg
+    pdf     append the page to the PDF of its category, the JPEG embedded as is
+
+The maps rendered first are drawn while the others are still being fetched, and the PDF of a category
+is finished as soon as its last map is rendered: pages are appended in the order of the map names,
+as soon as every page before them is ready. The queues hold at most --queue items, and a stage waits
+when the next one is full, so a slow stage caps the memory instead of piling up sessions or pages.
+The maps start in the order of the pages, and at most --queue maps beyond one per rendering process
+are in flight until their page is written, so the pages kept out of order are bounded too.
+
+When the catalog snapshot is fresh, the sessions are read from it instead of being fetched.
+Every map is rendered, like learning_maps.py --force, and the manifest is updated for the next
+incremental runs.
+'''
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+
+from PIL import Image
+
+from catalog import Catalog
+from event_profile import DEFAULT_PROFILE, EventProfile
+import image_output
+from image_output import ImageOutput
+from learning_maps import (Learning_Map, hash_sessions, load_manifest, make_events, make_folder, render_calendar,
+                           save_manifest, set_style)
+from pdf_generator import JPEG_QUALITY, PDF_FOLDER
+from rainfocus import RainfocusClient
+import replay
+from session import Session
+import spans
+
+
+QUEUE_SIZE = 4
+
+
+def render_page(name: str, sessions: List[Session], file_path: str, profile: EventProfile, output: ImageOutput,
+                max_width: int = None, quality: int = JPEG_QUALITY) -> bytes:
+    '''
+    Renders a learning map in a rendering process, and returns its PDF page encoded as JPEG.
+    Pages wider than `max_width` are downscaled. When `output` already wrote the map as JPEG at the
+    size and quality of the page, that file is the page, instead of encoding the same pixels again.
+    '''
+
+    set_style(profile)
+
+    with spans.span(name, 'map'):
+        image = render_calendar(name, make_events(sessions), file_path, profile, output)
+        resize = max_width is not None and image.width > max_width
+
+        if 'jpeg' in output.formats and output.quality == quality and not resize:
+            with spans.span('pdf page', 'image') as args, open(output.image_path(file_path, 'jpeg'), 'rb') as file:
+                page = file.read()
+                args['bytes'] = len(page)
+
+            return page
+
+        with spans.span('pdf page', 'image') as args:
+            page = image.convert('RGB')
+            if resize:
+                page = page.resize((max_width, round(page.height * max_width / page.width)), Image.LANCZOS)
+
+            content = io.BytesIO()
+            page.save(content, 'JPEG', quality=quality)
+            args['bytes'] = content.tell()
+
+    return content.getvalue()
+
+
+class JpegPdf:
+    '''
+    PDF written page by page to a binary file, each page a JPEG embedded as is (DCTDecode):
+    it is neither decoded nor encoded again. Objects 1 and 2, the catalog and the page tree,
+    are written last, once every page is known; each page takes the next three objects: image, content and page.
+    '''
+
+    def __init__(self, file):
+        self.file = file
+        self.offsets = {}
+        self.kids = []
+
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def write_object(self, number: int, dictionary: bytes, stream: bytes = None) -> None:
+        self.offsets[number] = self.file.tell()
+        self.file.write(b'%d 0 obj\n' % number + dictionary)
+        if stream is not None:
+            self.file.write(b'\nstream\n' + stream + b'\nendstream')
+        self.file.write(b'\nendobj\n')
+
+    def add_page(self, jpeg: bytes) -> None:
+        # Only the header is read, for the size of the page: one point per pixel, as PIL writes it.
+        with Image.open(io.BytesIO(jpeg)) as image:
+            width, height = image.size
+
+        number = 3 + 3 * len(self.kids)
+        content = b'q %d 0 0 %d 0 0 cm /image Do Q' % (width, height)
+
+        self.write_object(number, b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+                                  b'/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>' % (width, height, len(jpeg)), jpeg)
+        self.write_object(number + 1, b'<< /Length %d >>' % len(content), content)
+        self.write_object(number + 2, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                                      b'/Resources << /XObject << /image %d 0 R >> >> /Contents %d 0 R >>'
+                          % (width, height, number, number + 1))
+        self.kids.append(number + 2)
+
+    def close(self) -> None:
+        '''
+        Writes the catalog, the page tree and the cross-reference table. The file is left open.
+        '''
+
+        self.write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self.write_object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>'
+                          % (b' '.join(b'%d 0 R' % kid for kid in self.kids), len(self.kids)))
+
+        xref = self.file.tell()
+        size = len(self.offsets) + 1
+        self.file.write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        self.file.write(b''.join(b'%010d 00000 n \n' % self.offsets[number] for number in range(1, size)))
+        self.file.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref))
+
+
+class CategoryPdf:
+    '''
+    PDF of a category, written to a temporary file page by page, in the order of the map names,
+    and moved to `path` once its last page is written. The pages are the JPEGs of the rendering
+    processes, embedded as is by JpegPdf.
+    '''
+
+    def __init__(self, path: str, learning_maps: List[Learning_Map]):
+        self.path = path
+        self.order = [learning_map.id for learning_map in sorted(learning_maps, key=lambda item: (item.name, item.id))]
+        self.pages = {}
+        self.written = 0
+        self.file = None
+        self.pdf = None
+
+    def add(self, learning_map_id: str, page: bytes) -> int:
+        '''
+        Keeps the page of a map, and writes every page whose predecessors are written.
+        Returns the number of pages written, the PDF is complete once they are all written.
+        '''
+
+        self.pages[learning_map_id] = page
+        written = self.written
+
+        while self.written < len(self.order) and self.order[self.written] in self.pages:
+            if self.pdf is None:
+                self.file = open(self.path + '.tmp', 'wb')
+                self.pdf = JpegPdf(self.file)
+            self.pdf.add_page(self.pages.pop(self.order[self.written]))
+            self.written += 1
+
+        if self.written == len(self.order) and self.written > written:
+            self.pdf.close()
+            self.file.close()
+            os.replace(self.path + '.tmp', self.path)
+
+        return self.written - written
+
+
+def get_catalog(client: RainfocusClient, profile: EventProfile, args: argparse.Namespace) -> Catalog:
+    '''
+    Returns the snapshot of the event if it is fresh. Otherwise returns a catalog holding only
+    the facets of the first search page, the sessions of each map being fetched by the pipeline.
+    '''
+
+    if not (args.record or args.replay):
+        catalog = Catalog.load_fresh(profile.snapshot)
+        if catalog is not None:
+            return catalog
+
+    with spans.span('fetch'):
+        first_page = client.get_sessions_from(start=0)
+
+    return Catalog(first_page['attributes'], [], time.time())
+
+
+def fetch_items(client: RainfocusClient, learning_map: Learning_Map) -> List[dict]:
+    if learning_map.catalog.sessions:
+        return learning_map.get_sessions()
+
+    with spans.span('fetch', map=learning_map.name):
+        return list(client.iter_sessions({'type': 'session', 'search.learningmap': learning_map.id}))
+
+
+async def run(profile: EventProfile, client: RainfocusClient, output: ImageOutput, executor: ProcessPoolExecutor,
+              workers: int, args: argparse.Namespace) -> None:
+    loop = asyncio.get_running_loop()
+    threads = ThreadPoolExecutor(client.workers)
+
+    catalog = await loop.run_in_executor(threads, get_catalog, client, profile, args)
+    # The maps start in the order of their pages, so the page each PDF waits for is always in flight.
+    learning_maps = sorted(Learning_Map.get_learning_maps(catalog, profile),
+                           key=lambda item: (item.category, item.name, item.id))
+
+    pdf_folder = os.path.join(profile.output, PDF_FOLDER)
+    make_folder(pdf_folder)
+    pdfs: Dict[str, CategoryPdf] = {}
+    for category in Learning_Map.get_categories(learning_maps):
+        make_folder(profile.output + category)
+        pdfs[category] = CategoryPdf(os.path.join(pdf_folder, category + '.pdf'),
+                                     [learning_map for learning_map in learning_maps if learning_map.category == category])
+
+    fetched = asyncio.Queue(args.queue)
+    parsed = asyncio.Queue(args.queue)
+    rendered = asyncio.Queue(args.queue)
+    manifest = load_manifest(profile.output)
+    # A map holds a slot from its fetch until its page is written, which bounds the pages kept out of order.
+    in_flight = asyncio.Semaphore(workers + args.queue)
+
+    async def fetch() -> None:
+        # A fetch holds its slot until its sessions are queued, so a full queue also stops the fetches.
+        slots = asyncio.Semaphore(client.workers)
+
+        async def fetch_one(learning_map: Learning_Map) -> None:
+            async with slots:
+                items = await loop.run_in_executor(threads, fetch_items, client, learning_map)
+                await fetched.put((learning_map, items))
+
+        fetches = []
+        for learning_map in learning_maps:
+            await in_flight.acquire()
+            fetches.append(asyncio.create_task(fetch_one(learning_map)))
+
+        await asyncio.gather(*fetches)
+
+    def parse_items(learning_map: Learning_Map, items: List[dict]) -> List[Session]:
+        with spans.span('parse', map=learning_map.name):
+            return [catalog.parse(item, profile.timezone) for item in items]
+
+    async def parse() -> None:
+        for _ in learning_maps:
+            learning_map, items = await fetched.get()
+            sessions = await loop.run_in_executor(threads, parse_items, learning_map, items)
+            manifest[learning_map.id] = hash_sessions(sessions)
+            await parsed.put((learning_map, sessions))
+
+        for _ in range(workers):
+            await parsed.put(None)
+
+    async def render() -> None:
+        while (item := await parsed.get()) is not None:
+            learning_map, sessions = item
+            page, worker_spans = await loop.run_in_executor(
+                executor, spans.call_traced, render_page, learning_map.name, sessions, learning_map.file_path(),
+                profile, output, args.max_width, args.quality)
+            spans.RECORDER.merge(worker_spans)
+            print(f'-- DONE {learning_map.name} --')
+            await rendered.put((learning_map, page))
+
+    def add_page(learning_map: Learning_Map, page: bytes) -> int:
+        with spans.span('pdf', map=learning_map.name):
+            return pdfs[learning_map.category].add(learning_map.id, page)
+
+    async def pdf() -> None:
+        for _ in learning_maps:
+            learning_map, page = await rendered.get()
+            category_pdf = pdfs[learning_map.category]
+            written = await loop.run_in_executor(threads, add_page, learning_map, page)
+
+            for _ in range(written):
+                in_flight.release()
+            if written and category_pdf.written == len(category_pdf.order):
+                print(f'-- PDF {learning_map.category}: {len(category_pdf.order)} pages --')
+
+    try:
+        await asyncio.gather(fetch(), parse(), pdf(), *(render() for _ in range(workers)))
+    finally:
+        threads.shutdown()
+
+    save_manifest(profile.output, manifest)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profiles', nargs='*', default=[DEFAULT_PROFILE], help='event profiles, see the profiles folder')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of rendering processes')
+    parser.add_argument('--queue', type=int, default=QUEUE_SIZE, help='items held between two stages')
+    parser.add_argument('--max-width', type=int, help='downscale the PDF pages wider than this, in pixels')
+    image_output.add_arguments(parser)
+    replay.add_arguments(parser)
+    spans.add_arguments(parser)
+    args = parser.parse_args()
+    spans.start(args)
+    output = image_output.from_arguments(args)
+
+    client = None
+
+    # The rendering processes start from a fresh interpreter, instead of forking the threads of the fetch.
+    context = multiprocessing.get_context('forkserver')
+
+    with ProcessPoolExecutor(args.workers, mp_context=context) as executor:
+        for profile in [EventProfile.load(path) for path in args.profiles]:
+            credentials = replay.load_credentials(profile, args)
+            client = replay.make_client(credentials, args, profile, client)
+            asyncio.run(run(profile, client, output, executor, args.workers, args))
+
+    spans.finish(args, client.stats)
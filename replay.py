@@ -0,0 +1,189 @@
+from urllib.parse import parse_qsl, urlsplit
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from catalog import SNAPSHOT_MAX_AGE, Catalog
+from event_profile import EventProfile
+from rainfocus import WORKERS, RainfocusClient
+
+
+FIXTURES_FOLDER = './fixtures/'
+INDEX_FILE = 'index.json'
+REPLAY_CREDENTIALS = {'rfapiprofileid': 'replay'}
+
+
+def request_key(path: str, body) -> str:
+    '''
+    Returns the key of a request: a hash of its path and of its sorted form fields.
+    The host and the headers (credentials) are left out, so fixtures recorded against Rainfocus
+    can be replayed by any client, or served by fixture_server.py.
+    '''
+
+    if isinstance(body, bytes):
+        body = body.decode()
+
+    fields = sorted(parse_qsl(body or '', keep_blank_values=True))
+
+    return hashlib.sha256(json.dumps([path, fields]).encode()).hexdigest()
+
+
+class FixtureStore:
+    '''
+    Recorded responses on disk.
+
+    The bodies are gzip compressed and content-addressed: `objects/<sha256 of the body>.gz`,
+    so identical responses are stored once. `index.json` maps each request key to its body hash.
+    '''
+
+    def __init__(self, folder: str = FIXTURES_FOLDER):
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.index = {}
+
+        if os.path.exists(os.path.join(folder, INDEX_FILE)):
+            with open(os.path.join(folder, INDEX_FILE)) as file:
+                self.index = json.load(file)
+
+    def get(self, key: str) -> bytes:
+        '''
+        Returns the body recorded for the request key. Raises KeyError if it was never recorded.
+        '''
+
+        with gzip.open(os.path.join(self.folder, 'objects', self.index[key] + '.gz')) as file:
+            return file.read()
+
+    def put(self, key: str, body: bytes) -> None:
+        digest = hashlib.sha256(body).hexdigest()
+        path = os.path.join(self.folder, 'objects', digest + '.gz')
+
+        with self.lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path, 'wb') as file:
+                    file.write(body)
+
+            self.index[key] = digest
+
+            with open(os.path.join(self.folder, INDEX_FILE), 'w') as file:
+                json.dump(self.index, file, indent=4, sort_keys=True)
+
+
+class RecordingAdapter(HTTPAdapter):
+    '''
+    Sends the requests to the network and records the successful responses in a FixtureStore.
+    '''
+
+    def __init__(self, store: FixtureStore, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 200:
+            self.store.put(request_key(urlsplit(request.url).path, request.body), response.content)
+
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    '''
+    Answers the requests from a FixtureStore, without network access.
+    A request which was never recorded gets a 404.
+    '''
+
+    def __init__(self, store: FixtureStore):
+        super().__init__()
+        self.store = store
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+
+        try:
+            response._content = self.store.get(request_key(urlsplit(request.url).path, request.body))
+            response.status_code = 200
+        except KeyError:
+            response._content = b''
+            response.status_code = 404
+            response.reason = 'Not recorded'
+
+        return response
+
+    def close(self):
+        pass
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--record', action='store_true', help='record the Rainfocus responses in the fixtures folder')
+    parser.add_argument('--replay', action='store_true', help='replay the recorded Rainfocus responses, without network')
+    parser.add_argument('--fixtures', default=FIXTURES_FOLDER, help='folder of the recorded Rainfocus responses')
+
+
+def load_credentials(profile: EventProfile, args: argparse.Namespace) -> dict:
+    '''
+    Returns the credentials of the profile. A replay does not need any.
+    '''
+
+    return REPLAY_CREDENTIALS if args.replay else profile.load_credentials()
+
+
+def get_fixtures_folder(profile: EventProfile, args: argparse.Namespace) -> str:
+    '''
+    Returns the folder of the responses recorded for an event, e.g. fixtures/cisco_live_amsterdam_2024.
+    The requests of two events only differ by their credentials, which the request keys leave out,
+    so each event is recorded in its own folder.
+    '''
+
+    return os.path.join(args.fixtures, re.sub('[^a-z0-9]+', '_', profile.name.lower()).strip('_'))
+
+
+def make_client(credentials: dict, args: argparse.Namespace, profile: EventProfile,
+                client: RainfocusClient = None) -> RainfocusClient:
+    '''
+    Returns a client recording, replaying or simply sending the requests of an event, depending on the arguments.
+    A replay is not rate limited.
+
+    `client` is the client of a previous event of the run, if any. The new client shares its stats and,
+    when it sends its requests to Rainfocus, its connection pool and rate limiter.
+    '''
+
+    if client is not None and not (args.replay or args.record):
+        return client.with_credentials(credentials)
+
+    if args.replay:
+        new_client = RainfocusClient(credentials, rate=None,
+                                     adapter=ReplayAdapter(FixtureStore(get_fixtures_folder(profile, args))))
+    elif args.record:
+        adapter = RecordingAdapter(FixtureStore(get_fixtures_folder(profile, args)), pool_connections=1,
+                                   pool_maxsize=WORKERS)
+        new_client = RainfocusClient(credentials, adapter=adapter)
+    else:
+        new_client = RainfocusClient(credentials)
+
+    if client is not None:
+        new_client.stats = client.stats
+
+    return new_client
+
+
+def get_catalog(client: RainfocusClient, profile: EventProfile, args: argparse.Namespace,
+                max_age: float = SNAPSHOT_MAX_AGE) -> Catalog:
+    '''
+    Returns the catalog of the event, from its snapshot if younger than `max_age` seconds.
+    Records and replays always go through the client, and leave the snapshot of the profile untouched.
+    '''
+
+    if args.replay or args.record:
+        return Catalog.fetch(client)
+
+    return Catalog.get(client, profile.snapshot, max_age)
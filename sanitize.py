@@ -0,0 +1,29 @@
+'''
+Turns the HTML snippets of the catalog (abstracts, technologies) into plain text that openpyxl accepts.
+
+In order: HTML tags are removed, entities are decoded (`&amp;` becomes `&`), then the newlines and
+the control characters illegal in xlsx cells are removed. Tags are removed before decoding entities,
+so an escaped `&lt;b&gt;` stays in the text as `<b>`.
+'''
+
+import html
+import re
+
+
+# Control characters openpyxl refuses (all but tab, newline and carriage return), and newlines.
+ILLEGAL_CHARACTERS = [i for i in range(32) if i not in (9, 10, 13)] + [10]
+TRANSLATION = str.maketrans(dict.fromkeys(ILLEGAL_CHARACTERS))
+TAGS = re.compile('<[^>]*>')
+
+
+def clean_string(input_string: str) -> str:
+    '''
+    Takes a string, removes its HTML tags and illegal characters, and decodes its entities.
+    '''
+
+    if '<' in input_string:
+        input_string = TAGS.sub('', input_string)
+    if '&' in input_string:
+        input_string = html.unescape(input_string)
+
+    return input_string.translate(TRANSLATION)
@@ -0,0 +1,206 @@
+'''
+In-memory search index over the sessions of the catalog.
+
+The index is built once from the parsed Sessions. Each session gets a position, and every value of a facet
+maps to a bitmap of the positions holding it: abstract and title tokens, technologies, level, type, day,
+speakers and distinguished speakers. Bitmaps are Python ints, so a combined filter is a few ANDs and ORs
+computed in C, e.g. "Advanced + Security + distinguished speaker + Tuesday" in a few microseconds.
+
+The index is saved next to the catalog snapshot, e.g. catalog_snapshot.index.json, and reused while
+it was built from the same snapshot.
+
+Usage:
+    python search_index.py --levels Advanced --technologies Security --distinguished --days Tuesday
+    python search_index.py --text "segment routing" --speakers "Antoine Orsoni"
+'''
+
+from collections import defaultdict
+from typing import Dict, List, Optional
+import argparse
+import os
+import re
+import time
+
+import orjson
+
+from catalog import Catalog
+from event_profile import DEFAULT_PROFILE, EventProfile
+import replay
+from sanitize import clean_string
+from session import Level, Session
+import spans
+
+
+TOKENS = re.compile(r'[a-z0-9]+')
+FACETS = ('token', 'technology', 'level', 'type', 'day', 'speaker')
+
+
+def tokenize(text: str) -> List[str]:
+    '''
+    Returns the lower case words and numbers of a text, e.g. ['ipv6', 'in', 'the', 'enterprise'].
+    '''
+
+    return TOKENS.findall(text.lower())
+
+
+def get_index_path(snapshot_path: str) -> str:
+    return os.path.splitext(snapshot_path)[0] + '.index.json'
+
+
+class SearchIndex:
+    '''
+    Bitmaps of the session positions, per facet value. Facet values are lower case.
+    `distinguished` is the bitmap of the sessions with a distinguished speaker.
+    '''
+
+    def __init__(self, codes: List[str], facets: Dict[str, Dict[str, int]], distinguished: int, timestamp: float):
+        self.codes = codes
+        self.facets = facets
+        self.distinguished = distinguished
+        self.timestamp = timestamp
+
+    @staticmethod
+    def build(sessions: List[Session], timestamp: float = 0) -> 'SearchIndex':
+        facets = {facet: defaultdict(int) for facet in FACETS}
+        distinguished = 0
+
+        for position, session in enumerate(sessions):
+            bit = 1 << position
+            day = session.start.strftime('%A') if session.start else session.day_name
+
+            for token in set(tokenize(session.name) + tokenize(clean_string(session.abstract))):
+                facets['token'][token] |= bit
+            for technology in session.technologies:
+                facets['technology'][clean_string(technology).lower()] |= bit
+            for speaker in session.participants or []:
+                facets['speaker'][speaker.lower()] |= bit
+            if session.level:
+                facets['level'][session.level.value.lower()] |= bit
+            if session.type:
+                facets['type'][session.type.lower()] |= bit
+            if day:
+                facets['day'][day.lower()] |= bit
+            if session.distinguished_speaker:
+                distinguished |= bit
+
+        return SearchIndex([session.id for session in sessions],
+                           {facet: dict(values) for facet, values in facets.items()}, distinguished, timestamp)
+
+    def search(self, text: str = '', technologies: List[str] = (), levels: List[str] = (), types: List[str] = (),
+               days: List[str] = (), speakers: List[str] = (), distinguished: bool = False) -> List[str]:
+        '''
+        Returns the codes of the sessions matching every filter given, in catalog order.
+        Every word of `text` must be in the title or the abstract. Within the other filters,
+        any of the values matches, e.g. levels=['Intermediate', 'Advanced'].
+        '''
+
+        bitmap = (1 << len(self.codes)) - 1
+
+        for token in tokenize(text):
+            bitmap &= self.facets['token'].get(token, 0)
+
+        for facet, values in (('technology', technologies), ('level', levels), ('type', types),
+                              ('day', days), ('speaker', speakers)):
+            if values:
+                bitmap &= self.any_of(facet, values)
+
+        if distinguished:
+            bitmap &= self.distinguished
+
+        return self.get_codes(bitmap)
+
+    def any_of(self, facet: str, values: List[str]) -> int:
+        bitmap = 0
+
+        for value in values:
+            bitmap |= self.facets[facet].get(value.lower(), 0)
+
+        return bitmap
+
+    def get_codes(self, bitmap: int) -> List[str]:
+        codes = []
+
+        while bitmap:
+            lowest = bitmap & -bitmap
+            codes.append(self.codes[lowest.bit_length() - 1])
+            bitmap ^= lowest
+
+        return codes
+
+    def save(self, path: str) -> None:
+        '''
+        Writes the index as json, bitmaps as hexadecimal strings.
+        '''
+
+        facets = {facet: {value: format(bitmap, 'x') for value, bitmap in values.items()}
+                  for facet, values in self.facets.items()}
+
+        with open(path, 'wb') as file:
+            file.write(orjson.dumps({'timestamp': self.timestamp, 'codes': self.codes, 'facets': facets,
+                                     'distinguished': format(self.distinguished, 'x')}))
+
+    @staticmethod
+    def load(path: str) -> 'SearchIndex':
+        with open(path, 'rb') as file:
+            index = orjson.loads(file.read())
+
+        facets = {facet: {value: int(bitmap, 16) for value, bitmap in values.items()}
+                  for facet, values in index['facets'].items()}
+
+        return SearchIndex(index['codes'], facets, int(index['distinguished'], 16), index['timestamp'])
+
+    @staticmethod
+    def get(catalog: Catalog, profile: EventProfile, path: Optional[str] = None, snapshot: bool = True) -> 'SearchIndex':
+        '''
+        Returns the index saved next to the snapshot of the profile if it was built from the same catalog.
+        Otherwise builds it from the sessions of `catalog` and saves it.
+        A catalog which is not the snapshot, e.g. a replayed one, is only indexed in memory,
+        so the index of the snapshot is left untouched.
+        '''
+
+        path = path or get_index_path(profile.snapshot)
+
+        if snapshot and os.path.exists(path):
+            with spans.span('load_index'):
+                index = SearchIndex.load(path)
+            if index.timestamp == catalog.timestamp:
+                return index
+
+        with spans.span('index'):
+            sessions = [catalog.parse(session, profile.timezone) for session in catalog.sessions]
+            index = SearchIndex.build(sessions, catalog.timestamp)
+
+        if snapshot:
+            index.save(path)
+
+        return index
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', nargs='?', default=DEFAULT_PROFILE, help='event profile, see the profiles folder')
+    parser.add_argument('--text', default='', help='words which must all be in the title or the abstract')
+    parser.add_argument('--technologies', nargs='+', default=[], help='e.g. Security Programmability')
+    parser.add_argument('--levels', nargs='+', default=[], choices=[level.value for level in Level])
+    parser.add_argument('--types', nargs='+', default=[], help='session types, e.g. Breakout')
+    parser.add_argument('--days', nargs='+', default=[], help='e.g. Tuesday')
+    parser.add_argument('--speakers', nargs='+', default=[], help='full names of the speakers')
+    parser.add_argument('--distinguished', action='store_true', help='only sessions with a distinguished speaker')
+    replay.add_arguments(parser)
+    args = parser.parse_args()
+
+    profile = EventProfile.load(args.profile)
+    client = replay.make_client(replay.load_credentials(profile, args), args, profile)
+    catalog = replay.get_catalog(client, profile, args)
+    index = SearchIndex.get(catalog, profile, snapshot=not (args.replay or args.record))
+
+    start = time.perf_counter()
+    codes = index.search(args.text, args.technologies, args.levels, args.types, args.days, args.speakers,
+                         args.distinguished)
+    elapsed = time.perf_counter() - start
+
+    sessions = {session['code']: session for session in catalog.sessions}
+    for code in codes:
+        print(f'{code:12} {sessions[code]["title"]}')
+    print(f'{len(codes)} sessions out of {len(index.codes)}, found in {elapsed * 1e6:.0f} µs')
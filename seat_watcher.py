@@ -0,0 +1,180 @@
+'''
+Watches the seats left in the open sessions during the event.
+
+Every --interval seconds, each session type of open_sessions.py is polled in its own thread.
+The latest sessions are kept in memory, and only the sessions whose seats or waitlist changed
+are appended to a SQLite store, one row per change, so the store is the seat history of the event.
+
+The open_<type>.xlsx sheets are only rebuilt on demand: on SIGUSR1 (`kill -USR1 <pid>`),
+with --once, and when the watcher stops.
+'''
+
+from multiprocessing.pool import ThreadPool as Pool
+from typing import Dict, List, Tuple
+import argparse
+import os
+import signal
+import sqlite3
+import time
+
+import requests
+
+from event_profile import DEFAULT_PROFILE, EventProfile
+from open_sessions import OPEN_SESSIONS_FOLDER, SESSION_TYPES, write_sheet
+from rainfocus import RainfocusClient
+import replay
+from session import Session
+import spans
+
+
+SEATS_STORE = OPEN_SESSIONS_FOLDER + 'seats.sqlite'
+POLL_INTERVAL = 60
+
+
+class SeatStore:
+    '''
+    Append-only SQLite table of the seat changes: one row per session each time its seats
+    or waitlist change.
+    '''
+
+    def __init__(self, path: str = SEATS_STORE):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS seats (
+                polled_at REAL NOT NULL,
+                session_type TEXT NOT NULL,
+                code TEXT NOT NULL,
+                capacity INTEGER,
+                seats_remaining INTEGER,
+                waitlist_remaining INTEGER
+            )''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS seats_code ON seats (code, polled_at)')
+        self.connection.commit()
+
+    def latest(self) -> Dict[str, Tuple[int, int]]:
+        '''
+        Returns the last known seats and waitlist of each session, so a restarted watcher
+        does not append the sessions which did not change while it was stopped.
+        '''
+
+        rows = self.connection.execute('''
+            SELECT code, seats_remaining, waitlist_remaining FROM seats
+            WHERE rowid IN (SELECT MAX(rowid) FROM seats GROUP BY code)''')
+
+        return {code: (seats, waitlist) for code, seats, waitlist in rows}
+
+    def append(self, rows: List[tuple]) -> None:
+        with self.connection:
+            self.connection.executemany('INSERT INTO seats VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class SeatWatcher:
+    '''
+    Latest sessions of each session type, in memory, and the seats last written to the store.
+    '''
+
+    def __init__(self, client: RainfocusClient, store: SeatStore, profile: EventProfile,
+                 session_types: List[str] = SESSION_TYPES):
+        self.client = client
+        self.store = store
+        self.profile = profile
+        self.session_types = session_types
+        self.sessions = {session_type: [] for session_type in session_types}
+        self.seats = store.latest()
+
+    def fetch(self, session_type: str) -> List[Session]:
+        payload = {'type': 'session', 'search.sessiontype': session_type}
+
+        return [Session(item, self.profile.timezone).compact() for item in self.client.iter_sessions(payload)]
+
+    def poll(self) -> int:
+        '''
+        Polls every session type concurrently, then appends the changed sessions to the store.
+        Returns the number of changed sessions.
+        '''
+
+        polled_at = time.time()
+
+        with Pool(len(self.session_types)) as pool:
+            polled = pool.map(self.fetch, self.session_types)
+
+        rows = []
+
+        for session_type, sessions in zip(self.session_types, polled):
+            self.sessions[session_type] = sessions
+
+            for session in sessions:
+                seats = (session.seats_remaining, session.waitlist_remaining)
+                if self.seats.get(session.id) != seats:
+                    self.seats[session.id] = seats
+                    rows.append((polled_at, session_type, session.id, session.capacity, *seats))
+
+        self.store.append(rows)
+
+        return len(rows)
+
+    def export(self, folder: str = OPEN_SESSIONS_FOLDER) -> None:
+        '''
+        Rebuilds the open_<type>.xlsx sheets from the latest sessions in memory.
+        Session types which were never polled are left untouched.
+        '''
+
+        for session_type, sessions in self.sessions.items():
+            if sessions:
+                write_sheet(session_type, sessions, folder)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', nargs='?', default=DEFAULT_PROFILE, help='event profile, see the profiles folder')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='seconds between two polls')
+    parser.add_argument('--store', default=SEATS_STORE, help='SQLite file of the seat changes')
+    parser.add_argument('--once', action='store_true', help='poll once, rebuild the sheets and exit')
+    replay.add_arguments(parser)
+    args = parser.parse_args()
+
+    profile = EventProfile.load(args.profile)
+    client = replay.make_client(replay.load_credentials(profile, args), args, profile)
+    os.makedirs(os.path.dirname(args.store) or '.', exist_ok=True)
+    watcher = SeatWatcher(client, SeatStore(args.store), profile)
+
+    export_requested = False
+
+    def request_export(signum, frame):
+        global export_requested
+        export_requested = True
+
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, request_export)
+
+    try:
+        while True:
+            # A poll failing after the retries of the client, or on a page without sessions, e.g. an error
+            # body of Rainfocus, is skipped: the next one may succeed.
+            try:
+                changed = watcher.poll()
+                print(f'{time.strftime("%H:%M:%S")} {changed} sessions changed, {client.stats}')
+            except (requests.RequestException, ValueError, KeyError) as error:
+                print(f'{time.strftime("%H:%M:%S")} poll failed: {error!r}')
+            finally:
+                # The watcher has no run report: drop the spans of the requests, which would pile up for days.
+                spans.RECORDER.pop()
+
+            if args.once:
+                break
+
+            deadline = time.monotonic() + args.interval
+            while time.monotonic() < deadline:
+                if export_requested:
+                    export_requested = False
+                    watcher.export()
+                time.sleep(min(1, max(0, deadline - time.monotonic())))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.export()
+        watcher.store.close()
@@ -0,0 +1,160 @@
+from datetime import datetime, timezone, tzinfo
+from enum import Enum
+from functools import lru_cache
+from typing import List, Optional
+
+
+class Level(str, Enum):
+    '''
+    Technical level of a session, given by the first digit of its code: BRKENS-2xxx is Intermediate.
+    '''
+
+    INTRODUCTORY = 'Introductory'
+    INTERMEDIATE = 'Intermediate'
+    ADVANCED = 'Advanced'
+    GENERAL = 'General'
+
+    @staticmethod
+    def from_code(code: str) -> Optional['Level']:
+        try:
+            digit = code.split('-')[1][0]
+        except IndexError:
+            return None
+
+        return LEVELS.get(digit)
+
+
+LEVELS = {'1': Level.INTRODUCTORY, '2': Level.INTERMEDIATE, '3': Level.ADVANCED, '4': Level.GENERAL}
+
+# Marks a lazy field which has not been decoded yet. Ellipsis is a singleton, so it survives pickling
+# when sessions are sent to the rendering processes.
+_UNSET = ...
+
+
+class Session:
+    '''
+    A session of the catalog, shared by every script.
+
+    The fields needed by every script (code, title, type, level, times, seats) are decoded in __init__.
+    abstract, participants, distinguished_speaker and technologies are only decoded the first time
+    they are read, from the session json the Session keeps a reference to.
+
+    Missing values are None. A session is `incomplete` when it has no start or end time.
+    start and end are naive datetimes in the local time of `event_timezone`, or in UTC when it is None.
+    '''
+
+    __slots__ = ('id', 'name', 'type', 'level', 'start', 'end', 'incomplete',
+                 'day_name', 'capacity', 'seats_remaining', 'waitlist_remaining', 'room_id', 'room',
+                 '_json', '_participants', '_distinguished_speaker', '_technologies')
+
+    def __init__(self, session_json: dict, event_timezone: Optional[tzinfo] = None):
+        self._json = session_json
+        self._participants = _UNSET
+        self._distinguished_speaker = _UNSET
+        self._technologies = _UNSET
+
+        self.id: str = session_json['code']
+        self.name: str = session_json['title']
+        self.type: str = session_json['type']
+        self.level: Optional[Level] = Level.from_code(self.id)
+
+        times = (session_json.get('times') or [{}])[0]
+        self.start: Optional[datetime] = parse_time(times.get('utcStartTime'), event_timezone)
+        self.end: Optional[datetime] = parse_time(times.get('utcEndTime'), event_timezone)
+        self.incomplete: bool = self.start is None or self.end is None
+
+        self.day_name: Optional[str] = times.get('dayName')
+        self.capacity: Optional[int] = to_int(times.get('capacity'))
+        self.seats_remaining: Optional[int] = to_int(times.get('seatsRemaining'))
+        self.waitlist_remaining: Optional[int] = to_int(times.get('waitlistRemaining'))
+        self.room_id: Optional[str] = times.get('roomId')
+        self.room: Optional[str] = times.get('room')
+
+    @property
+    def abstract(self) -> str:
+        return self._json.get('abstract', '')
+
+    @property
+    def participants(self) -> Optional[List[str]]:
+        '''
+        Full names of the speakers, or None when the session has no participants.
+        '''
+
+        if self._participants is _UNSET:
+            self._decode_participants()
+
+        return self._participants
+
+    @property
+    def distinguished_speaker(self) -> bool:
+        '''
+        True when at least one of the speakers is a Cisco Live Distinguished Speaker.
+        '''
+
+        if self._distinguished_speaker is _UNSET:
+            self._decode_participants()
+
+        return self._distinguished_speaker
+
+    @property
+    def technologies(self) -> List[str]:
+        if self._technologies is _UNSET:
+            self._technologies = [attribute['value'] for attribute in self._json.get('attributevalues', [])
+                                  if attribute['attribute_id'] == 'Technology']
+
+        return self._technologies
+
+    def compact(self) -> 'Session':
+        '''
+        Decodes the lazy fields now, and only keeps the abstract of the session json.
+        For the sessions kept long after their search page, e.g. by the seat watcher:
+        the json of a session weighs about 17 KB, most of it the participants and attribute values.
+        Returns the session.
+        '''
+
+        if self._participants is _UNSET:
+            self._decode_participants()
+        self.technologies
+        self._json = {'abstract': self.abstract}
+
+        return self
+
+    def _decode_participants(self) -> None:
+        participants = self._json.get('participants')
+
+        if participants is None:
+            self._participants = None
+            self._distinguished_speaker = False
+            return
+
+        self._participants = [participant['globalFullName'] for participant in participants]
+        self._distinguished_speaker = any(attribute['attribute_id'] == 'distinguished_speaker'
+                                          for participant in participants
+                                          for attribute in participant.get('attributevalues', []))
+
+    def __str__(self) -> str:
+        return f"{self.id} - {self.name}"
+
+
+@lru_cache(maxsize=4096)
+def parse_time(value: Optional[str], event_timezone: Optional[tzinfo] = None) -> Optional[datetime]:
+    '''
+    Parses a Rainfocus UTC time, e.g. '2024/02/08 13:00:00', and converts it to the local time of the event.
+
+    The format is fixed, so datetime.fromisoformat does the parsing, much faster than strptime.
+    Sessions share a few hundred time slots, so the results are cached.
+    '''
+
+    if value is None:
+        return None
+
+    utc = datetime.fromisoformat(value.replace('/', '-'))
+
+    if event_timezone is None:
+        return utc
+
+    return utc.replace(tzinfo=timezone.utc).astimezone(event_timezone).replace(tzinfo=None)
+
+
+def to_int(value) -> Optional[int]:
+    return None if value is None else int(value)
@@ -0,0 +1,213 @@
+'''
+Timing and resource instrumentation of the generators.
+
+Stages are wrapped in spans, e.g.:
+
+    with spans.span('parse'):
+        ...
+
+Each span records its wall time, process, thread and the resident memory of the process when it ends.
+The span yields its arguments, so a stage can add what it only knows at the end:
+
+    with spans.span('png', 'image') as args:
+        ...
+        args['bytes'] = os.path.getsize(path)
+
+Rendering processes send their spans back with `call_traced`. At the end of a run, `finish` prints
+a summary report and can write the spans as a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+'''
+
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import List
+import argparse
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import psutil
+
+
+SLOWEST_MAPS = 5
+
+
+class Span:
+    __slots__ = ('name', 'category', 'start', 'end', 'pid', 'tid', 'thread', 'rss', 'args')
+
+    def __init__(self, name: str, category: str, start: float, end: float, rss: int, args: dict):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = end
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.thread = threading.current_thread().name
+        self.rss = rss
+        self.args = args
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Recorder:
+    '''
+    Thread-safe list of the spans of a process.
+    '''
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+        self.process = psutil.Process()
+
+    @contextmanager
+    def span(self, name: str, category: str = 'stage', **args):
+        start = time.time()
+
+        try:
+            yield args
+        finally:
+            # A forked worker inherits the psutil.Process of its parent.
+            if self.process.pid != os.getpid():
+                self.process = psutil.Process()
+
+            span = Span(name, category, start, time.time(), self.process.memory_info().rss, args)
+            with self.lock:
+                self.spans.append(span)
+
+    def merge(self, spans: List[Span]) -> None:
+        with self.lock:
+            self.spans.extend(spans)
+
+    def pop(self) -> List[Span]:
+        with self.lock:
+            spans, self.spans = self.spans, []
+
+        return spans
+
+    def report(self, stats=None) -> str:
+        '''
+        Returns the time spent per stage, the slowest learning maps, the request rate and the peak memory.
+        `stats` are the Stats of the RainfocusClient, if any.
+        '''
+
+        if not self.spans:
+            return 'No span recorded'
+
+        wall = max(span.end for span in self.spans) - min(span.start for span in self.spans)
+        lines = [f'Run: {wall:.2f}s', '', f'{"stage":20} {"count":>6} {"total":>9} {"average":>9}']
+
+        stages = defaultdict(list)
+        for span in self.spans:
+            if span.category == 'stage':
+                stages[span.name].append(span.duration)
+
+        for name, durations in sorted(stages.items(), key=lambda item: -sum(item[1])):
+            lines.append(f'{name:20} {len(durations):6} {sum(durations):8.2f}s {sum(durations) / len(durations):8.3f}s')
+
+        maps = sorted((span for span in self.spans if span.category == 'map'), key=lambda span: -span.duration)
+        if maps:
+            lines += ['', 'Slowest learning maps:']
+            lines += [f'{span.duration:8.2f}s  {span.name}' for span in maps[:SLOWEST_MAPS]]
+
+        images = defaultdict(list)
+        for span in self.spans:
+            if span.category == 'image':
+                images[span.name].append(span)
+
+        if images:
+            lines += ['', f'{"image":20} {"count":>6} {"written":>9} {"encode":>9}']
+            for name, image_spans in sorted(images.items()):
+                written = sum(span.args.get('bytes', 0) for span in image_spans)
+                encode = sum(span.duration for span in image_spans)
+                lines.append(f'{name:20} {len(image_spans):6} {written / 1e6:6.1f} MB {encode:8.2f}s')
+
+        requests = [span for span in self.spans if span.name == 'http']
+        if requests:
+            elapsed = max(span.end for span in requests) - min(span.start for span in requests)
+            lines += ['', f'Rainfocus: {len(requests)} requests in {elapsed:.2f}s, {len(requests) / elapsed:.1f} requests/s']
+        if stats is not None:
+            lines.append(f'Rainfocus: {stats}')
+
+        peaks = defaultdict(int)
+        for span in self.spans:
+            peaks[span.pid] = max(peaks[span.pid], span.rss)
+
+        lines += ['', f'Peak RSS: {peaks.pop(os.getpid(), 0) / 1e6:.0f} MB']
+        if peaks:
+            lines.append(f'Peak RSS of the {len(peaks)} rendering processes: {max(peaks.values()) / 1e6:.0f} MB')
+        if tracemalloc.is_tracing():
+            lines.append(f'Peak traced Python allocations: {tracemalloc.get_traced_memory()[1] / 1e6:.0f} MB')
+
+        return '\n'.join(lines)
+
+    def write_chrome_trace(self, path: str) -> None:
+        '''
+        Writes the spans in the Chrome trace event format: one complete event per span,
+        one memory counter per process, and the names of the threads.
+        '''
+
+        origin = min(span.start for span in self.spans)
+        events = []
+        threads = {}
+
+        for span in sorted(self.spans, key=lambda span: span.start):
+            timestamp = (span.start - origin) * 1e6
+            threads[(span.pid, span.tid)] = span.thread
+            events.append({'name': span.name, 'cat': span.category, 'ph': 'X', 'ts': timestamp,
+                           'dur': span.duration * 1e6, 'pid': span.pid, 'tid': span.tid, 'args': span.args})
+            events.append({'name': 'RSS MB', 'ph': 'C', 'ts': (span.end - origin) * 1e6, 'pid': span.pid,
+                           'args': {'rss': span.rss / 1e6}})
+
+        for (pid, tid), thread in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}})
+
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+RECORDER = Recorder()
+
+
+def span(name: str, category: str = 'stage', **args):
+    '''
+    Records a span in the recorder of the process.
+    '''
+
+    return RECORDER.span(name, category, **args)
+
+
+def call_traced(function, *args):
+    '''
+    Calls `function` in a worker process and returns its result with the spans it recorded,
+    to be merged into the recorder of the main process.
+    '''
+
+    RECORDER.pop()
+    result = function(*args)
+
+    return result, RECORDER.pop()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--trace', help='write the spans of the run to this Chrome trace JSON file')
+    parser.add_argument('--tracemalloc', action='store_true', help='track the peak of Python allocations (slower)')
+
+
+def start(args: argparse.Namespace) -> None:
+    if args.tracemalloc:
+        tracemalloc.start()
+
+
+def finish(args: argparse.Namespace, stats=None) -> None:
+    '''
+    Prints the report of the run, and writes its Chrome trace if asked.
+    '''
+
+    print(RECORDER.report(stats))
+
+    if args.trace and RECORDER.spans:
+        RECORDER.write_chrome_trace(args.trace)
+        print(f'Trace written to {args.trace}')